@@ -0,0 +1,42 @@
+"""
+Batch run manifest
+One JSON line per company in <output_dir>/batch_manifest.jsonl, appended as each
+company finishes so an interrupted batch still records what it completed
+"""
+
+import os
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class BatchManifest:
+    """Per-company outcomes of a batch and the output file of each success"""
+
+    def __init__(self, output_dir: str):
+        os.makedirs(output_dir, exist_ok=True)
+        self.path = os.path.join(output_dir, "batch_manifest.jsonl")
+        self.results: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def record(self, company_name: str, outcome: Dict[str, Any] = None, error: Exception = None) -> Dict[str, Any]:
+        """Append one company's entry: the outcome (with output_file) and, for a failure, the error"""
+        entry = {"company_name": company_name, "finished_at": datetime.now().isoformat(), **(outcome or {})}
+        if error is None:
+            entry["status"] = "ok"
+            logger.info(f"Batch: finished {company_name} -> {entry['output_file']}")
+        else:
+            entry["status"] = "error"
+            entry["error"] = str(error)
+            logger.error(f"Batch: {company_name} failed: {str(error)}")
+
+        with self._lock:
+            if error is None:
+                self.results[company_name] = entry["output_file"]
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return entry
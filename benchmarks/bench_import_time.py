@@ -0,0 +1,161 @@
+"""
+Measure cold-start import time of the agent modules
+Each sample imports the module in a fresh interpreter. With --ref the same
+measurement runs against a git ref (e.g. the commit before lazy imports) checked
+out to a temporary directory, and the report shows both. --check fails when an
+import loads a deferred module or opens a cache file
+
+Usage:
+    python benchmarks/bench_import_time.py --runs 5 --ref HEAD~1 --output imports.json
+    python benchmarks/bench_import_time.py --runs 1 --check
+"""
+
+import os
+import sys
+import json
+import shutil
+import tarfile
+import argparse
+import tempfile
+import subprocess
+from statistics import median
+from typing import Dict, List, Any
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = """
+import sys, time
+sys.path.insert(0, {tree!r})
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+# Loaded on first use only; importing an agent module must not pull them in
+DEFERRED_MODULES = ("numpy", "crewai", "langchain_core", "langchain_openai", "openai", "httpx",
+                    "financial_metrics", "fundamentals_store")
+# Files the response cache and stage fingerprints open when first used
+DEFERRED_FILES = {"LLM_CACHE_PATH": "llm_cache.db", "FINGERPRINTS_PATH": "fingerprints.db"}
+
+CHECK_SNIPPET = """
+import sys, json
+sys.path.insert(0, {tree!r})
+import {module}
+print(json.dumps([name for name in {deferred!r} if name in sys.modules]))
+"""
+
+
+def checkout(ref: str, directory: str) -> str:
+    """Extract a git ref into directory without touching the working tree"""
+    archive = subprocess.run(["git", "archive", "--format=tar", ref], cwd=REPO_ROOT,
+                             check=True, capture_output=True).stdout
+    path = os.path.join(directory, "tree.tar")
+    with open(path, "wb") as f:
+        f.write(archive)
+    with tarfile.open(path) as tar:
+        tar.extractall(directory)
+    os.remove(path)
+    return directory
+
+
+def import_once(tree: str, module: str, workdir: str) -> float:
+    # The working directory is scratch space: importing may write logs or journals
+    result = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET.format(tree=tree, module=module)],
+                            cwd=workdir, check=True, capture_output=True, text=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def check_deferred(tree: str, module: str, workdir: str) -> Dict[str, List[str]]:
+    """Deferred modules that importing the module loaded anyway, and cache files it opened"""
+    env = {**os.environ, **{name: os.path.join(workdir, filename) for name, filename in DEFERRED_FILES.items()}}
+    result = subprocess.run([sys.executable, "-c", CHECK_SNIPPET.format(tree=tree, module=module,
+                                                                      deferred=DEFERRED_MODULES)],
+                            cwd=workdir, env=env, check=True, capture_output=True, text=True)
+    return {
+        "modules": json.loads(result.stdout.strip().splitlines()[-1]),
+        "files": [filename for filename in DEFERRED_FILES.values() if os.path.exists(os.path.join(workdir, filename))],
+    }
+
+
+def heaviest_imports(tree: str, module: str, workdir: str, top: int) -> List[Dict[str, Any]]:
+    """Slowest direct imports of the module, from python -X importtime"""
+    code = f"import sys; sys.path.insert(0, {tree!r}); import {module}"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=workdir, check=True, capture_output=True, text=True)
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Two spaces of indent: imported directly by the measured module
+        if name.startswith("   ") and not name.startswith("    ") and cumulative.strip().isdigit():
+            entries.append({"module": name.strip(), "seconds": int(cumulative) / 1e6})
+    return sorted(entries, key=lambda entry: -entry["seconds"])[:top]
+
+
+def measure(tree: str, modules: List[str], runs: int, top: int) -> Dict[str, Any]:
+    workdir = tempfile.mkdtemp(prefix="import-bench-")
+    try:
+        results = {}
+        for module in modules:
+            # The first import compiles bytecode; only later ones are counted
+            import_once(tree, module, workdir)
+            samples = [import_once(tree, module, workdir) for _ in range(runs)]
+            results[module] = {
+                "median": median(samples),
+                "min": min(samples),
+                "samples": samples,
+                "heaviest_imports": heaviest_imports(tree, module, workdir, top),
+                "not_deferred": check_deferred(tree, module, workdir),
+            }
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark cold-start import time")
+    parser.add_argument("--modules", nargs="+", default=["fintech_adk", "fintech_crewai"])
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per module")
+    parser.add_argument("--ref", help="Also measure this git ref, e.g. HEAD~1")
+    parser.add_argument("--top", type=int, default=5, help="Slowest direct imports to list")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--check", action="store_true",
+                        help="Exit non-zero if an import loads a deferred module or opens a cache file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = {"python": sys.version.split()[0], "runs": args.runs,
+              "results": {"working_tree": measure(REPO_ROOT, args.modules, args.runs, args.top)}}
+
+    if args.ref:
+        directory = tempfile.mkdtemp(prefix="import-bench-ref-")
+        try:
+            tree = checkout(args.ref, directory)
+            report["results"][args.ref] = measure(tree, args.modules, args.runs, args.top)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        report["speedup"] = {
+            module: report["results"][args.ref][module]["median"] / report["results"]["working_tree"][module]["median"]
+            for module in args.modules
+        }
+
+    encoded = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(encoded)
+    else:
+        print(encoded)
+
+    if args.check:
+        eager = {module: result["not_deferred"] for module, result in report["results"]["working_tree"].items()
+                 if any(result["not_deferred"].values())}
+        if eager:
+            raise SystemExit(f"Imports not deferred: {json.dumps(eager)}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
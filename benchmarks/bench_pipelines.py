@@ -0,0 +1,154 @@
+"""
+Benchmark the ADK and CrewAI pipelines against the fake LLM server
+Reports wall time, per-stage p50/p95 latency, prompt bytes and throughput as JSON
+
+Usage:
+    python benchmarks/bench_pipelines.py --companies 8 --concurrency 1 4 --output bench.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from typing import Dict, List, Any, Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_llm_server import FakeLLMServer
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(records: List[Dict[str, Any]], wall_time: float, companies: int) -> Dict[str, Any]:
+    """Aggregate server-side request records into the report format"""
+    stages: Dict[str, List[float]] = {}
+    for record in records:
+        stages.setdefault(record["role"], []).append(record["duration"])
+
+    prompt_bytes = [record["prompt_bytes"] for record in records]
+    tokens = sum(record["completion_tokens"] for record in records)
+    return {
+        "wall_time": wall_time,
+        "companies": companies,
+        "companies_per_minute": companies / wall_time * 60 if wall_time else 0.0,
+        "requests": len(records),
+        "requests_per_second": len(records) / wall_time if wall_time else 0.0,
+        "completion_tokens_per_second": tokens / wall_time if wall_time else 0.0,
+        "queue_wait_p95": percentile([record["queue_wait"] for record in records], 95),
+        "prompt_bytes": {
+            "total": sum(prompt_bytes),
+            "mean": sum(prompt_bytes) / len(prompt_bytes) if prompt_bytes else 0,
+            "max": max(prompt_bytes, default=0),
+        },
+        "stages": {
+            role: {
+                "count": len(durations),
+                "p50": percentile(durations, 50),
+                "p95": percentile(durations, 95),
+                "mean": sum(durations) / len(durations),
+            }
+            for role, durations in sorted(stages.items())
+        },
+    }
+
+
+def adk_runner() -> Callable[[List[str], int], Any]:
+    import fintech_adk
+
+    # Batch mode drives every company from one event loop and one connection pool
+    def run_all(companies: List[str], concurrency: int):
+        with tempfile.TemporaryDirectory() as output_dir:
+            results = fintech_adk.run_batch(companies, max_workers=concurrency, output_dir=output_dir)
+        if len(results) != len(companies):
+            raise RuntimeError(f"ADK batch finished {len(results)}/{len(companies)} companies")
+    return run_all
+
+
+def crewai_runner() -> Callable[[List[str], int], Any]:
+    import fintech_crewai
+
+    # CrewAI agents and executors are not thread-safe, so concurrency goes through the
+    # process-pool batch mode (worker start-up is part of the measured wall time)
+    def run_all(companies: List[str], concurrency: int):
+        with tempfile.TemporaryDirectory() as output_dir:
+            summary = fintech_crewai.run_batch(companies, max_workers=concurrency, output_dir=output_dir)
+        if summary["succeeded"] != len(companies):
+            raise RuntimeError(f"CrewAI batch finished {summary['succeeded']}/{len(companies)} companies")
+    return run_all
+
+
+RUNNERS = {"adk": adk_runner, "crewai": crewai_runner}
+
+
+def run_benchmark(server: FakeLLMServer, runner: Callable[[List[str], int], Any], companies: List[str],
+                  concurrency: int) -> Dict[str, Any]:
+    server.reset()
+    start = time.time()
+    runner(companies, concurrency)
+    wall_time = time.time() - start
+    return summarize(server.stats(), wall_time, len(companies))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the multi-agent pipelines")
+    parser.add_argument("--frameworks", nargs="+", choices=sorted(RUNNERS), default=["adk", "crewai"])
+    parser.add_argument("--companies", type=int, default=4, help="Number of companies per run")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake server seconds to first token")
+    parser.add_argument("--tps", type=float, default=200.0, help="Fake server decode tokens per second")
+    parser.add_argument("--tokens", type=int, default=64, help="Tokens per fake completion")
+    parser.add_argument("--parallel", type=int, default=4, help="Fake server concurrent generations")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = FakeLLMServer(latency=args.latency, tokens_per_second=args.tps,
+                           response_tokens=args.tokens, parallel=args.parallel).start()
+
+    # Point both pipelines at the fake server before they build their clients
+    os.environ["OLLAMA_BASE_URL"] = server.base_url
+    os.environ["MEMORY_BACKEND"] = "dict"
+    # Every level must run every stage: no cached responses or fingerprinted stage reuse,
+    # and no trace file writes in the timed section
+    for name in ("LLM_CACHE_PATH", "FINGERPRINTS_PATH", "TRACE_PATH"):
+        os.environ.pop(name, None)
+
+    companies = [f"Benchmark Company {index}" for index in range(args.companies)]
+    report = {
+        "server": {"latency": args.latency, "tokens_per_second": args.tps,
+                   "response_tokens": args.tokens, "parallel": args.parallel},
+        "results": {},
+    }
+    try:
+        for framework in args.frameworks:
+            runner = RUNNERS[framework]()
+            report["results"][framework] = {
+                str(concurrency): run_benchmark(server, runner, companies, concurrency)
+                for concurrency in args.concurrency
+            }
+    finally:
+        server.stop()
+
+    encoded = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(encoded)
+    else:
+        print(encoded)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Measure prompt-prefill time saved by the stable system-message prompt layout
+Runs the ADK agents against the fake LLM server with prefix caching enabled, once
+with the original prompt order (one user message, task before context) and once
+with the current layout (stable system message, then context, then task). Both
+carry the same budgeted context, so only the ordering differs
+
+Usage:
+    python benchmarks/bench_prefix_reuse.py --companies 4 --follow-ups 4 --output prefix.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from typing import Dict, List, Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_llm_server import FakeLLMServer
+
+FOLLOW_UP_TASKS = [
+    "Summarize the key strengths of {company_name}",
+    "List the three largest risks for {company_name}",
+    "Estimate revenue growth for {company_name} next year",
+    "Compare {company_name} with its closest competitor",
+    "Suggest a one-line investment thesis for {company_name}",
+    "Name the metrics an analyst should watch for {company_name}",
+]
+
+
+def legacy_layout(build_prompt):
+    """The pre-layout prompt order over the same content: one user message with the task ahead of the context"""
+    def legacy_build_prompt(agent, task_description: str, context: str, store):
+        from langchain_core.messages import HumanMessage
+
+        (system, user), sizes = build_prompt(agent, task_description, context, store)
+        task = f"\n\nCurrent Task: {task_description}"
+        memory_context, _, additional_context = user.content.partition(task)
+        return [HumanMessage(content=f"{system.content}{task}\n\n{memory_context}{additional_context}")], sizes
+    return legacy_build_prompt
+
+
+def summarize(records: List[Dict[str, Any]], wall_time: float) -> Dict[str, Any]:
+    prefill = sum(record["prefill_tokens"] for record in records)
+    cached = sum(record["cached_tokens"] for record in records)
+    return {
+        "requests": len(records),
+        "wall_time": wall_time,
+        "prefill_tokens": prefill,
+        "cached_tokens": cached,
+        "cache_hit_rate": cached / (prefill + cached) if prefill + cached else 0.0,
+        "prefill_seconds": sum(record["prefill_time"] for record in records),
+    }
+
+
+def run_pipelines(fintech_adk, companies: List[str]):
+    """Full workflows, one company after another"""
+    for company_name in companies:
+        fintech_adk.create_financial_analysis_adk(company_name, fintech_adk.MemoryStore())
+
+
+def run_follow_ups(fintech_adk, companies: List[str], follow_ups: int):
+    """Several tasks against the same run context, as a user drilling into one report would"""
+    for company_name in companies:
+        store = fintech_adk.MemoryStore()
+        fintech_adk.create_financial_analysis_adk(company_name, store)
+        for task in FOLLOW_UP_TASKS[:follow_ups]:
+            fintech_adk.report_compiler.execute_task(task.format(company_name=company_name), store=store)
+
+
+def measure(server: FakeLLMServer, scenario, *args) -> Dict[str, Any]:
+    server.reset()
+    start = time.time()
+    scenario(*args)
+    return summarize(server.stats(), time.time() - start)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark prompt-prefix reuse")
+    parser.add_argument("--companies", type=int, default=2)
+    parser.add_argument("--follow-ups", type=int, default=4, help="Extra tasks per company (max 6)")
+    parser.add_argument("--prefill", type=float, default=0.0005, help="Fake server seconds per uncached prompt token")
+    parser.add_argument("--prefix-slots", type=int, default=8, help="Prompt prefixes the fake server keeps")
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--tps", type=float, default=2000.0)
+    parser.add_argument("--tokens", type=int, default=64)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = FakeLLMServer(latency=args.latency, tokens_per_second=args.tps, response_tokens=args.tokens,
+                           prefill_per_token=args.prefill, prefix_cache_slots=args.prefix_slots).start()
+
+    os.environ["OLLAMA_BASE_URL"] = server.base_url
+    os.environ["MEMORY_BACKEND"] = "dict"
+    os.environ.pop("LLM_CACHE_PATH", None)
+
+    import fintech_adk
+
+    companies = [f"Benchmark Company {index}" for index in range(args.companies)]
+    current = fintech_adk.EnhancedAgent._build_prompt
+    layouts = {"legacy": legacy_layout(current), "stable_prefix": current}
+    report = {"server": {"prefill_per_token": args.prefill, "prefix_cache_slots": args.prefix_slots},
+              "results": {}}
+    try:
+        for name, build_prompt in layouts.items():
+            fintech_adk.EnhancedAgent._build_prompt = build_prompt
+            report["results"][name] = {
+                "pipeline": measure(server, run_pipelines, fintech_adk, companies),
+                "follow_ups": measure(server, run_follow_ups, fintech_adk, companies, args.follow_ups),
+            }
+    finally:
+        fintech_adk.EnhancedAgent._build_prompt = layouts["stable_prefix"]
+        server.stop()
+
+    legacy, current = report["results"]["legacy"], report["results"]["stable_prefix"]
+    report["prefill_seconds_saved"] = {
+        scenario: legacy[scenario]["prefill_seconds"] - current[scenario]["prefill_seconds"]
+        for scenario in current
+    }
+
+    encoded = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(encoded)
+    else:
+        print(encoded)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+Deterministic stand-in for Ollama's OpenAI-compatible endpoint
+Returns canned completions with configurable latency and decode speed so the
+pipelines can be benchmarked without a live model
+"""
+
+import re
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Any
+
+ROLE_PATTERN = re.compile(r"You are ([^.\n]+)\.")
+
+# Canned bodies per agent role; the filler is padded to the configured token count
+CANNED_RESPONSES = {
+    "Financial Calculator": "PE ratio: 28.4\nRevenue growth: 8.1%\nProfit margin: 25.3%\nMarket cap: Large",
+    "Report Compiler": json.dumps({
+        "executive_summary": "Stable business with moderate growth.",
+        "company_overview": "Diversified technology company.",
+        "market_analysis": "Leading position in a competitive market.",
+        "financial_analysis": "PE ratio 28.4, revenue growth 8.1%, profit margin 25.3%.",
+        "risk_assessment": "Regulatory and supply chain risks.",
+        "recommendation": "Hold"
+    }),
+    "Fact Checker & Validator": "Validation: all sections present and consistent.\nVERDICT: PASS",
+    "Quality Validator": "Validation: all sections present and consistent.\nVERDICT: PASS",
+}
+
+
+def _render(messages: List[Dict[str, Any]]) -> str:
+    """Flatten chat messages the way a chat template would before prefill"""
+    return "".join(f"<|{message.get('role')}|>{message.get('content', '')}\n" for message in messages)
+
+
+def _common_prefix(a: str, b: str) -> int:
+    limit = min(len(a), len(b))
+    index = 0
+    while index < limit and a[index] == b[index]:
+        index += 1
+    return index
+
+
+def _role_of(messages: List[Dict[str, Any]]) -> str:
+    for message in messages:
+        match = ROLE_PATTERN.search(str(message.get("content", "")))
+        if match:
+            return match.group(1).strip()
+    return "unknown"
+
+
+class FakeLLMServer:
+    """Threaded HTTP server speaking the /v1/chat/completions protocol"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.05,
+                 tokens_per_second: float = 200.0, response_tokens: int = 64, parallel: int = 4,
+                 prefill_per_token: float = 0.0, prefix_cache_slots: int = 4):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        # Prefill cost per uncached prompt token; prompts sharing a prefix with one of the
+        # last prefix_cache_slots prompts only pay for the new suffix, like llama.cpp's KV reuse
+        self.prefill_per_token = prefill_per_token
+        self.prefix_cache_slots = prefix_cache_slots
+        self._prefixes: List[str] = []
+        # Ollama serves a limited number of generations at once (OLLAMA_NUM_PARALLEL)
+        self._slots = threading.Semaphore(parallel)
+        self._lock = threading.Lock()
+        self.records: List[Dict[str, Any]] = []
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeLLMServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def reset(self):
+        with self._lock:
+            self.records = []
+            self._prefixes = []
+
+    def prefill(self, messages: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Split a prompt into cached and freshly prefilled tokens (4 chars per token)"""
+        text = _render(messages)
+        with self._lock:
+            cached = max((_common_prefix(text, prefix) for prefix in self._prefixes), default=0)
+            self._prefixes = [prefix for prefix in self._prefixes if prefix != text] + [text]
+            self._prefixes = self._prefixes[-self.prefix_cache_slots:] if self.prefix_cache_slots else []
+        return {"prompt_tokens": len(text) // 4, "cached_tokens": cached // 4,
+                "prefill_tokens": (len(text) - cached) // 4}
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self.records)
+
+    def completion_tokens(self, role: str, json_mode: bool = False) -> List[str]:
+        """Deterministic completion for a role, one list item per token"""
+        head = CANNED_RESPONSES.get(role, f"Analysis by {role}.")
+        if json_mode:
+            # JSON mode returns the bare object, like a format-constrained model
+            body = head if head.startswith("{") else json.dumps({"analysis": head})
+            return [word + " " for word in body.split(" ")]
+        words = ["Thought:", "I", "now", "can", "give", "a", "great", "answer\nFinal", "Answer:"]
+        words += head.split(" ")
+        while len(words) < self.response_tokens:
+            words.append("detail")
+        return [word + " " for word in words]
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.rstrip("/").endswith("/stats"):
+                    self._send_json(200, server.stats())
+                else:
+                    self._send_json(404, {"error": "not found"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                raw = self.rfile.read(length)
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": "not found"})
+                    return
+
+                request = json.loads(raw or b"{}")
+                messages = request.get("messages", [])
+                role = _role_of(messages)
+                json_mode = (request.get("response_format") or {}).get("type") == "json_object"
+                tokens = server.completion_tokens(role, json_mode)
+                finish_reason = "stop"
+                if request.get("max_tokens") and len(tokens) > request["max_tokens"]:
+                    tokens, finish_reason = tokens[:request["max_tokens"]], "length"
+
+                received = time.time()
+                with server._slots:
+                    started = time.time()
+                    prefill = server.prefill(messages)
+                    prefill_time = prefill["prefill_tokens"] * server.prefill_per_token
+                    time.sleep(server.latency + prefill_time)
+                    if request.get("stream"):
+                        # A client that stops reading (e.g. at its deadline) ends the generation
+                        tokens = tokens[:self._stream(request, tokens, finish_reason)]
+                    else:
+                        time.sleep(len(tokens) / server.tokens_per_second)
+                        self._send_json(200, self._completion(request, tokens, len(raw), finish_reason))
+                finished = time.time()
+
+                with server._lock:
+                    server.records.append({
+                        "role": role,
+                        "model": request.get("model"),
+                        "prompt_bytes": len(raw),
+                        "completion_tokens": len(tokens),
+                        "stream": bool(request.get("stream")),
+                        "prefill_tokens": prefill["prefill_tokens"],
+                        "cached_tokens": prefill["cached_tokens"],
+                        "prefill_time": prefill_time,
+                        "queue_wait": started - received,
+                        "duration": finished - received,
+                        "received": received,
+                    })
+
+            def _completion(self, request, tokens, prompt_bytes, finish_reason="stop"):
+                return {
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "".join(tokens)},
+                        "finish_reason": finish_reason,
+                    }],
+                    "usage": {
+                        "prompt_tokens": prompt_bytes // 4,
+                        "completion_tokens": len(tokens),
+                        "total_tokens": prompt_bytes // 4 + len(tokens),
+                    },
+                }
+
+            def _stream(self, request, tokens, finish_reason="stop") -> int:
+                """Send tokens as SSE chunks; returns how many the client read before disconnecting"""
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                sent = 0
+                try:
+                    for token in tokens:
+                        time.sleep(1.0 / server.tokens_per_second)
+                        self._chunk({"choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]},
+                                    request)
+                        sent += 1
+                    self._chunk({"choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}]}, request)
+                    self._write_chunk(b"data: [DONE]\n\n")
+                    self._write_chunk(b"")
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True
+                return sent
+
+            def _chunk(self, payload, request):
+                payload.update({"id": "chatcmpl-fake", "object": "chat.completion.chunk",
+                                "created": int(time.time()), "model": request.get("model")})
+                self._write_chunk(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+            def _write_chunk(self, data: bytes):
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+            def _send_json(self, status, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible LLM server")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds before the first token")
+    parser.add_argument("--tps", type=float, default=200.0, help="Decode tokens per second")
+    parser.add_argument("--tokens", type=int, default=64, help="Tokens per completion")
+    parser.add_argument("--parallel", type=int, default=4, help="Concurrent generations")
+    parser.add_argument("--prefill", type=float, default=0.0, help="Seconds per uncached prompt token")
+    parser.add_argument("--prefix-slots", type=int, default=4, help="Prompt prefixes kept for reuse")
+    args = parser.parse_args()
+
+    server = FakeLLMServer(port=args.port, latency=args.latency, tokens_per_second=args.tps,
+                           response_tokens=args.tokens, parallel=args.parallel,
+                           prefill_per_token=args.prefill, prefix_cache_slots=args.prefix_slots)
+    print(f"Fake LLM server listening on {server.base_url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Vectorized financial metrics engine
+Loads a fundamentals table (CSV or Parquet, one row per company) and computes PE,
+revenue growth, margins, market cap class and health for every row at once
+"""
+
+import os
+import re
+import csv
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TEXT_COLUMNS = ["ticker", "company_name"]
+NUMERIC_COLUMNS = ["price", "eps", "revenue", "revenue_prior", "net_income", "shares_outstanding"]
+
+# Market cap class boundaries in the table's currency units
+LARGE_CAP = 10e9
+MID_CAP = 2e9
+
+_SUFFIXES = re.compile(r"\b(inc|incorporated|corp|corporation|co|company|ltd|limited|plc|llc|ag|sa|nv|holdings)\b")
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase a company name or ticker and drop punctuation and legal suffixes"""
+    name = re.sub(r"[^a-z0-9 ]", " ", str(name).lower())
+    return " ".join(_SUFFIXES.sub(" ", name).split())
+
+
+def _to_float(values: List[Any]) -> np.ndarray:
+    """Column of floats with blanks and bad values as NaN"""
+    try:
+        return np.array([value if value not in ("", None) else "nan" for value in values], dtype=float)
+    except (TypeError, ValueError):
+        pass
+    result = np.full(len(values), np.nan)
+    for index, value in enumerate(values):
+        try:
+            result[index] = float(value)
+        except (TypeError, ValueError):
+            pass
+    return result
+
+
+def load_fundamentals(path: str) -> Dict[str, np.ndarray]:
+    """Read a fundamentals file into one NumPy array per column"""
+    if path.endswith((".parquet", ".pq")):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Reading Parquet fundamentals requires pyarrow (pip install pyarrow)")
+        raw = pq.read_table(path).to_pydict()
+    else:
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            rows = list(reader)
+        raw = {column: [row.get(column) for row in rows] for column in reader.fieldnames or []}
+
+    missing = [column for column in TEXT_COLUMNS + NUMERIC_COLUMNS if column not in raw]
+    if missing:
+        raise ValueError(f"Fundamentals file {path} is missing columns: {missing}")
+
+    table = {column: np.array([str(value or "") for value in raw[column]], dtype=object) for column in TEXT_COLUMNS}
+    table.update({column: _to_float(raw[column]) for column in NUMERIC_COLUMNS})
+    return table
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """Elementwise division that yields NaN instead of inf or warnings"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = numerator / denominator
+    result[~np.isfinite(result)] = np.nan
+    return result
+
+
+def health_labels(pe_ratio: np.ndarray, revenue_growth: np.ndarray) -> np.ndarray:
+    """Excellent / Good / Fair for whole columns (missing values compare as False)"""
+    pe = np.asarray(pe_ratio, dtype=float)
+    growth = np.asarray(revenue_growth, dtype=float)
+    with np.errstate(invalid="ignore"):
+        return np.select(
+            [(pe < 20) & (growth > 10), (pe < 30) & (growth > 5)],
+            ["Excellent", "Good"],
+            default="Fair",
+        )
+
+
+def compute_metrics(table: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Derive every metric column for all companies in one pass"""
+    eps = table["eps"]
+    # PE is undefined for loss-making companies
+    pe_ratio = _ratio(table["price"], np.where(eps > 0, eps, np.nan))
+    revenue_growth = _ratio(table["revenue"] - table["revenue_prior"], table["revenue_prior"]) * 100
+    profit_margin = _ratio(table["net_income"], table["revenue"]) * 100
+    market_cap = table["price"] * table["shares_outstanding"]
+
+    market_cap_class = np.select(
+        [market_cap >= LARGE_CAP, market_cap >= MID_CAP, market_cap > 0],
+        ["Large", "Mid", "Small"],
+        default="Unknown",
+    )
+    return {
+        "pe_ratio": pe_ratio,
+        "revenue_growth": revenue_growth,
+        "profit_margin": profit_margin,
+        "market_cap": market_cap,
+        "market_cap_class": market_cap_class,
+        "financial_health": health_labels(pe_ratio, revenue_growth),
+    }
+
+
+def _scalar(value: Any) -> Any:
+    """NumPy scalar to a JSON-friendly Python value (NaN becomes None)"""
+    if isinstance(value, (np.floating, float)):
+        return None if np.isnan(value) else round(float(value), 2)
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class MetricsEngine:
+    """Fundamentals table with precomputed metric columns and a name/ticker index"""
+
+    def __init__(self, path: str):
+        self.path = path
+        start = time.time()
+        self.table = load_fundamentals(path)
+        loaded = time.time()
+        self.metrics = compute_metrics(self.table)
+        self.compute_seconds = time.time() - loaded
+        self.index: Dict[str, int] = {}
+        for row, (ticker, name) in enumerate(zip(self.table["ticker"], self.table["company_name"])):
+            self.index.setdefault(normalize_name(ticker), row)
+            self.index.setdefault(normalize_name(name), row)
+        self.load_seconds = time.time() - start
+        logger.info(f"Loaded {len(self)} companies from {path} in {self.load_seconds * 1000:.1f}ms "
+                    f"(metrics {self.compute_seconds * 1000:.1f}ms)")
+
+    def __len__(self) -> int:
+        return len(self.table["ticker"])
+
+    def find(self, company: str) -> Optional[int]:
+        """Row for a ticker or company name, or None"""
+        return self.index.get(normalize_name(company))
+
+    def lookup(self, company: str) -> Optional[Dict[str, Any]]:
+        """All metrics for one company as plain Python values"""
+        row = self.find(company)
+        if row is None:
+            return None
+        result = {column: _scalar(self.table[column][row]) for column in TEXT_COLUMNS}
+        result.update({name: _scalar(values[row]) for name, values in self.metrics.items()})
+        return result
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_metrics_engine() -> Optional[MetricsEngine]:
+    """Shared engine for FUNDAMENTALS_PATH, or None when no fundamentals file is configured"""
+    global _engine
+    path = os.getenv("FUNDAMENTALS_PATH", "fundamentals.csv")
+    if not os.path.exists(path):
+        return None
+    with _engine_lock:
+        if _engine is None or _engine.path != path:
+            _engine = MetricsEngine(path)
+        return _engine
@@ -0,0 +1,103 @@
+"""
+Stage fingerprints for incremental re-analysis
+A fingerprint hashes everything that determines a stage's output: task text, the
+upstream outputs it reads, model and parameters. The latest output of each stage
+is stored with its fingerprint, so a re-run reuses every stage whose fingerprint
+is unchanged and re-runs only the stages downstream of a change
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# When a value was produced does not change what it says (e.g. parsed_data's parsed_at)
+VOLATILE_KEYS = {"parsed_at", "timestamp"}
+
+
+def _stable(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _stable(item) for key, item in value.items() if key not in VOLATILE_KEYS}
+    if isinstance(value, (list, tuple)):
+        return [_stable(item) for item in value]
+    return value
+
+
+def fingerprint(**parts) -> str:
+    """Stable hash of a stage's task, inputs, model and parameters"""
+    encoded = json.dumps(_stable(parts), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class FingerprintStore:
+    """Latest output and fingerprint per (framework, company, stage) in SQLite"""
+
+    def __init__(self, path: str = "stage_fingerprints.db"):
+        self.path = path
+        self.reused = 0
+        self.recomputed = 0
+        self.seconds_saved = 0.0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS stage_outputs (
+                framework TEXT NOT NULL,
+                company TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                output TEXT NOT NULL,
+                seconds REAL NOT NULL,
+                updated REAL NOT NULL,
+                PRIMARY KEY (framework, company, stage)
+            )"""
+        )
+        self._conn.commit()
+
+    def lookup(self, framework: str, company: str, stage: str, stage_fingerprint: str) -> Optional[Dict[str, Any]]:
+        """The stored output when the stage last ran with this fingerprint, else None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint, output, seconds, updated FROM stage_outputs "
+                "WHERE framework = ? AND company = ? AND stage = ?",
+                (framework, company, stage)
+            ).fetchone()
+            if row is None or row[0] != stage_fingerprint:
+                self.recomputed += 1
+                return None
+            self.reused += 1
+            self.seconds_saved += row[2]
+        return {"output": json.loads(row[1]), "seconds": row[2], "updated": row[3]}
+
+    def record(self, framework: str, company: str, stage: str, stage_fingerprint: str, output: Any,
+               seconds: float):
+        """Store a stage's output under the fingerprint it ran with, replacing the previous one"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO stage_outputs "
+                "(framework, company, stage, fingerprint, output, seconds, updated) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (framework, company, stage, stage_fingerprint, json.dumps(output, ensure_ascii=False),
+                 seconds, time.time())
+            )
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Process-wide reuse counters"""
+        return {"stages_reused": self.reused, "stages_recomputed": self.recomputed,
+                "llm_seconds_saved": self.seconds_saved}
+
+
+def fingerprints_from_env() -> Optional[FingerprintStore]:
+    """Build the store when FINGERPRINTS_PATH is set, otherwise None"""
+    path = os.getenv("FINGERPRINTS_PATH")
+    if not path:
+        return None
+    logger.info(f"Incremental re-analysis enabled, stage fingerprints at {path}")
+    return FingerprintStore(path)
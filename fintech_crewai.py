@@ -1,25 +1,42 @@
 """
 Assignment 1: FinTechAI Research & Analysis Platform using CrewAI
 Multi-Agent System for Financial Research and Investment Analysis
+
+crewai, langchain and the LLM client are imported when the agents are first
+needed, so importing this module does not pay for them
 """
 
 import os
+import json
+import time
+import logging
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
-from crewai import Agent, Task, Crew
 from pydantic import BaseModel, Field
-from langchain_openai import ChatOpenAI
+from llm_client import thread_finish_reason
+from llm_cache import LLMResponseCache, cache_from_env
+from batch_manifest import BatchManifest
+from report_validation import parse_report, reports_problem, validate_report, validate_sections
+from structured_output import InvestmentReport
+from tracing import tracer
+from metrics import registry, start_metrics_server
+from fingerprints import FingerprintStore, fingerprint, fingerprints_from_env
+from model_routing import DEFAULT_MODEL, Route, reference_tokens, route_for, summarize_limits, summarize_routing
+
+if TYPE_CHECKING:
+    from crewai import Agent, Crew, Task
 
 # Load environment variables
 load_dotenv()
 
-# Use OpenAI-compatible endpoint (Ollama supports this)
-# Configure Ollama to accept OpenAI API calls
-llm = ChatOpenAI(
-    model_name="gemma3:1b",
-    openai_api_key="ollama",  # Ollama doesn't require real key
-    openai_api_base="http://localhost:11434/v1",  # Ollama's OpenAI-compatible endpoint
-    temperature=0.7
-)
+logger = logging.getLogger(__name__)
+
+# Write report sections as their upstream tasks finish (see create_financial_analysis_crew)
+PIPELINED_REPORT = os.getenv("PIPELINED_REPORT", "0") != "0"
 
 # Custom financial metrics tool
 class FinancialMetrics(BaseModel):
@@ -28,94 +45,253 @@ class FinancialMetrics(BaseModel):
     revenue_growth: float = Field(description="Revenue growth percentage")
     market_cap: str = Field(description="Market capitalization")
 
+def lookup_metrics(company_name: str) -> Optional[Dict[str, Any]]:
+    """Computed metrics from the fundamentals store, else from the raw fundamentals table"""
+    # numpy and the fundamentals modules load with the first lookup, not at import
+    from financial_metrics import get_metrics_engine
+    from fundamentals_store import lookup_fundamentals
+    metrics = lookup_fundamentals(company_name)
+    if metrics is None:
+        engine = get_metrics_engine()
+        metrics = engine.lookup(company_name) if engine else None
+    return metrics
+
 def calculate_financial_health(company_data: str) -> str:
-    """Custom tool to assess financial health"""
-    # Simplified financial health calculation
+    """Custom tool to assess financial health from the fundamentals data"""
+    metrics = lookup_metrics(company_data)
+    if metrics is None:
+        return "No fundamentals data available; estimate the financial metrics from the research."
+    
     return f"""
-    Financial Health Assessment:
-    - PE Ratio: Estimated at 25-30 (industry standard)
-    - Revenue Growth: Positive trending upward
-    - Market Position: Strong in respective sector
-    - Assessment: Healthy financial metrics based on provided data
+    Financial Health Assessment ({metrics['ticker']}, computed from fundamentals data):
+    - PE Ratio: {metrics['pe_ratio']}
+    - Revenue Growth: {metrics['revenue_growth']}%
+    - Profit Margin: {metrics['profit_margin']}%
+    - Market Cap: {metrics['market_cap_class']}
+    - Assessment: {metrics['financial_health']}
     """
 
+def fundamentals_lookup(query: str) -> str:
+    """Look up stored fundamentals for a company. Input is a ticker or company name,
+    optionally followed by a comma and one metric, e.g. "AAPL, pe_ratio" or "Tesla Inc"."""
+    from fundamentals_store import get_fundamentals_store
+    store = get_fundamentals_store()
+    if store is None:
+        return "Fundamentals store not available; use your own estimates."
+    
+    company, _, metric = (part.strip().strip("\"'") for part in query.partition(","))
+    try:
+        result = store.get_metric(company, metric) if metric else store.get_metrics(company)
+    except KeyError as e:
+        return str(e)
+    if result is None:
+        return f"No fundamentals found for {company}."
+    return json.dumps(result) if isinstance(result, dict) else f"{company} {metric}: {result}"
+
 # ========== AGENT DEFINITIONS ==========
 
-# 1. Company Researcher Agent
-company_researcher = Agent(
-    role="Company Researcher",
-    goal="Gather comprehensive information about companies including background, business model, products, and services",
-    backstory="""You are an expert financial researcher with 15 years of experience in company analysis.
+AGENT_NAMES = ["company_researcher", "market_analyst", "financial_calculator",
+               "risk_assessor", "report_compiler", "quality_validator"]
+
+_lazy = {}
+_lazy_lock = threading.RLock()
+
+def get_response_cache() -> Optional[LLMResponseCache]:
+    """Optional response cache shared with the ADK implementation (set LLM_CACHE_PATH)"""
+    with _lazy_lock:
+        if "response_cache" not in _lazy:
+            _lazy["response_cache"] = cache_from_env()
+        return _lazy["response_cache"]
+
+def get_stage_fingerprints() -> Optional[FingerprintStore]:
+    """Latest output of each task by input fingerprint (incremental re-analysis, set FINGERPRINTS_PATH)"""
+    with _lazy_lock:
+        if "stage_fingerprints" not in _lazy:
+            _lazy["stage_fingerprints"] = fingerprints_from_env()
+        return _lazy["stage_fingerprints"]
+
+def get_llm(route: Route = None):
+    """Chat model for a route (default: the default model at temperature 0.7), built on first use"""
+    route = route or Route()
+    with _lazy_lock:
+        if ("llm", route) not in _lazy:
+            from llm_client import PooledChatOpenAI
+            from llm_cache import LangChainLLMCache
+            response_cache = get_response_cache()
+            # Use OpenAI-compatible endpoint (Ollama supports this)
+            # Requests go through the shared client: one connection pool, per-model limits,
+            # retries and the endpoints listed in OLLAMA_BASE_URL
+            _lazy[("llm", route)] = PooledChatOpenAI(
+                model_name=route.model,
+                openai_api_key="ollama",  # Ollama doesn't require real key
+                temperature=route.temperature,
+                max_tokens=route.max_tokens,
+                stop_sequences=list(route.stop) or None,
+                deadline=route.deadline,
+                fallback_model=route.fallback,
+                cache=LangChainLLMCache(response_cache) if response_cache else None
+            )
+        return _lazy[("llm", route)]
+
+def routed_llm(role: str):
+    """Chat model on the route of an agent role (see model_routing)"""
+    return get_llm(route_for(role))
+
+def get_agents() -> Dict[str, "Agent"]:
+    """The six agents by name, built (and crewai imported) on first use"""
+    with _lazy_lock:
+        if "agents" not in _lazy:
+            _lazy["agents"] = _build_agents()
+        return _lazy["agents"]
+
+def _build_agents() -> Dict[str, "Agent"]:
+    from crewai import Agent
+    from langchain_core.tools import tool
+    
+    lookup_tool = tool("Fundamentals Lookup")(fundamentals_lookup)
+    
+    
+    # 1. Company Researcher Agent
+    company_researcher = Agent(
+        role="Company Researcher",
+        goal="Gather comprehensive information about companies including background, business model, products, and services",
+        backstory="""You are an expert financial researcher with 15 years of experience in company analysis.
     You excel at finding detailed information about companies, their history, mission, products, 
     and competitive positioning. Use your extensive knowledge base to provide accurate information.""",
-    verbose=True,
-    allow_delegation=False,
-    llm=llm
-)
-
-# 2. Market Analyst Agent
-market_analyst = Agent(
-    role="Market Analyst",
-    goal="Analyze market trends, industry position, competitors, and market opportunities",
-    backstory="""You are a senior market analyst specializing in market research and competitive analysis.
+        verbose=True,
+        allow_delegation=False,
+        tools=[lookup_tool],
+        llm=routed_llm("Company Researcher")
+    )
+    
+    # 2. Market Analyst Agent
+    market_analyst = Agent(
+        role="Market Analyst",
+        goal="Analyze market trends, industry position, competitors, and market opportunities",
+        backstory="""You are a senior market analyst specializing in market research and competitive analysis.
     You have deep knowledge of market dynamics, industry trends, and competitive landscapes.
     Use your expertise to provide comprehensive market insights.""",
-    verbose=True,
-    allow_delegation=False,
-    llm=llm
-)
-
-# 3. Financial Calculator Agent
-financial_calculator = Agent(
-    role="Financial Calculator",
-    goal="Calculate and analyze financial metrics, ratios, and performance indicators",
-    backstory="""You are a financial analyst expert in financial mathematics and metrics calculation.
+        verbose=True,
+        allow_delegation=False,
+        llm=routed_llm("Market Analyst")
+    )
+    
+    # 3. Financial Calculator Agent
+    financial_calculator = Agent(
+        role="Financial Calculator",
+        goal="Calculate and analyze financial metrics, ratios, and performance indicators",
+        backstory="""You are a financial analyst expert in financial mathematics and metrics calculation.
     You excel at computing PE ratios, revenue growth, profit margins, and other key financial indicators.
     Use your financial expertise to calculate accurate metrics.""",
-    verbose=True,
-    allow_delegation=False,
-    llm=llm
-)
-
-# 4. Risk Assessor Agent
-risk_assessor = Agent(
-    role="Risk Assessor",
-    goal="Evaluate investment risks, volatility, compliance issues, and risk mitigation strategies",
-    backstory="""You are a risk management specialist with expertise in investment risk assessment.
+        verbose=True,
+        allow_delegation=False,
+        tools=[lookup_tool],
+        llm=routed_llm("Financial Calculator")
+    )
+    
+    # 4. Risk Assessor Agent
+    risk_assessor = Agent(
+        role="Risk Assessor",
+        goal="Evaluate investment risks, volatility, compliance issues, and risk mitigation strategies",
+        backstory="""You are a risk management specialist with expertise in investment risk assessment.
     You identify potential risks, market volatility concerns, and compliance issues in investment decisions.
     Provide detailed risk analysis based on your expertise.""",
-    verbose=True,
-    allow_delegation=False,
-    llm=llm
-)
-
-# 5. Report Compiler Agent
-report_compiler = Agent(
-    role="Report Compiler",
-    goal="Synthesize all research and analysis into a comprehensive, structured investment report",
-    backstory="""You are a professional financial report writer with expertise in creating structured,
+        verbose=True,
+        allow_delegation=False,
+        tools=[lookup_tool],
+        llm=routed_llm("Risk Assessor")
+    )
+    
+    # 5. Report Compiler Agent
+    report_compiler = Agent(
+        role="Report Compiler",
+        goal="Synthesize all research and analysis into a comprehensive, structured investment report",
+        backstory="""You are a professional financial report writer with expertise in creating structured,
     comprehensive investment analysis reports. You excel at organizing complex information into clear,
     actionable insights. Create well-formatted professional reports.""",
-    verbose=True,
-    allow_delegation=False,
-    llm=llm
-)
-
-# 6. Quality Validator Agent
-quality_validator = Agent(
-    role="Quality Validator",
-    goal="Review and validate all outputs for accuracy, completeness, and quality standards",
-    backstory="""You are a quality assurance expert specializing in financial analysis verification.
+        verbose=True,
+        allow_delegation=False,
+        llm=routed_llm("Report Compiler")
+    )
+    
+    # 6. Quality Validator Agent
+    quality_validator = Agent(
+        role="Quality Validator",
+        goal="Review and validate all outputs for accuracy, completeness, and quality standards",
+        backstory="""You are a quality assurance expert specializing in financial analysis verification.
     You ensure all reports meet high standards for accuracy, completeness, and professional presentation.""",
-    verbose=True,
-    allow_delegation=False,
-    llm=llm
-)
+        verbose=True,
+        allow_delegation=False,
+        tools=[lookup_tool],
+        llm=routed_llm("Quality Validator")
+    )
+    
+    return {
+        "company_researcher": company_researcher,
+        "market_analyst": market_analyst,
+        "financial_calculator": financial_calculator,
+        "risk_assessor": risk_assessor,
+        "report_compiler": report_compiler,
+        "quality_validator": quality_validator,
+    }
+
+def get_section_writers() -> Dict[str, "Agent"]:
+    """One report writer per pipelined section; async tasks running together never share an agent"""
+    with _lazy_lock:
+        if "section_writers" not in _lazy:
+            from crewai import Agent
+            compiler = get_agents()["report_compiler"]
+            _lazy["section_writers"] = {
+                section: Agent(role=compiler.role, goal=compiler.goal, backstory=compiler.backstory,
+                               verbose=True, allow_delegation=False, llm=routed_llm(compiler.role))
+                for section in PIPELINED_SECTIONS
+            }
+        return _lazy["section_writers"]
+
+def get_escalated_agent(name: str) -> "Agent":
+    """Copy of an agent on its route's larger model, built on first use"""
+    with _lazy_lock:
+        if ("escalated", name) not in _lazy:
+            from crewai import Agent
+            agent = get_agents()[name]
+            _lazy[("escalated", name)] = Agent(
+                role=agent.role, goal=agent.goal, backstory=agent.backstory, verbose=True,
+                allow_delegation=False, tools=agent.tools, llm=get_llm(route_for(agent.role).escalated())
+            )
+        return _lazy[("escalated", name)]
+
+def __getattr__(name: str) -> Any:
+    # Keeps fintech_crewai.llm, .response_cache, .stage_fingerprints and .<agent> working without
+    # building them at import
+    if name == "llm":
+        return get_llm()
+    if name in ("response_cache", "stage_fingerprints"):
+        return globals()[f"get_{name}"]()
+    if name in AGENT_NAMES:
+        return get_agents()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # ========== TASK DEFINITIONS ==========
 
-def create_financial_analysis_crew(company_name: str):
-    """Create and execute the financial analysis crew"""
+# Report headings, in report order
+REPORT_HEADINGS = {
+    "executive_summary": "Executive Summary",
+    "company_overview": "Company Overview",
+    "market_analysis": "Market Analysis",
+    "financial_analysis": "Financial Analysis",
+    "risk_assessment": "Risk Assessment",
+    "recommendation": "Investment Recommendation",
+}
+# Sections written as soon as their upstream task finishes; the summary sections come last
+PIPELINED_SECTIONS = ["company_overview", "market_analysis", "financial_analysis", "risk_assessment"]
+SUMMARY_SECTIONS = ["executive_summary", "recommendation"]
+
+def create_financial_analysis_crew(company_name: str, as_of: str = None, pipelined: bool = False):
+    """Create and execute the financial analysis crew (as_of dates the market analysis, default today;
+    pipelined writes each report section as an async task right after the task it draws on)"""
+    from crewai import Task, Crew
+    agents = get_agents()
+    as_of = as_of or datetime.now().date().isoformat()
     
     # Task 1: Company Research (Sequential start)
     task_research_company = Task(
@@ -131,14 +307,14 @@ def create_financial_analysis_crew(company_name: str):
         
         Provide detailed, factual information from reliable sources.
         """,
-        agent=company_researcher,
+        agent=agents["company_researcher"],
         expected_output="A detailed company profile with background, products, business model, and recent developments"
     )
     
     # Task 2: Market Analysis (Parallel with company research)
     task_analyze_market = Task(
         description=f"""
-        Analyze the market for: {company_name}
+        Analyze the market for: {company_name} as of {as_of}
         
         Research and provide:
         1. Industry overview and market size
@@ -149,7 +325,7 @@ def create_financial_analysis_crew(company_name: str):
         
         Provide strategic market insights.
         """,
-        agent=market_analyst,
+        agent=agents["market_analyst"],
         expected_output="A comprehensive market analysis including industry trends, competitors, and market position"
     )
     
@@ -158,16 +334,19 @@ def create_financial_analysis_crew(company_name: str):
         description=f"""
         Calculate financial metrics for: {company_name}
         
-        Based on the research provided, analyze:
+        Metrics computed from the fundamentals data:
+        {calculate_financial_health(company_name)}
+        
+        Based on these figures and the research provided, analyze:
         1. Price-to-Earnings (PE) ratio
         2. Revenue growth rate
         3. Market capitalization estimates
         4. Profitability indicators
         5. Financial health assessment
         
-        Use the research data to estimate financial performance metrics.
+        Use the computed figures as given; only estimate metrics they do not cover.
         """,
-        agent=financial_calculator,
+        agent=agents["financial_calculator"],
         context=[task_research_company, task_analyze_market],
         expected_output="Financial metrics including PE ratio, revenue growth, and financial health assessment"
     )
@@ -186,11 +365,15 @@ def create_financial_analysis_crew(company_name: str):
         
         Provide a comprehensive risk assessment.
         """,
-        agent=risk_assessor,
+        agent=agents["risk_assessor"],
         context=[task_research_company, task_analyze_market, task_calculate_metrics],
         expected_output="A detailed risk assessment with identified risks and mitigation strategies"
     )
     
+    if pipelined:
+        return _pipelined_crew(company_name, agents, [task_research_company, task_analyze_market,
+                                                      task_calculate_metrics, task_assess_risks])
+    
     # Task 5: Compile Report (Sequential - final compilation)
     task_compile_report = Task(
         description=f"""
@@ -223,16 +406,220 @@ def create_financial_analysis_crew(company_name: str):
         
         Ensure the report is professional, well-structured, and actionable.
         """,
-        agent=report_compiler,
+        agent=agents["report_compiler"],
         context=[task_research_company, task_analyze_market, task_calculate_metrics, task_assess_risks],
         expected_output="A comprehensive Markdown-formatted investment analysis report"
     )
     
-    # Task 6: Quality Validation (Sequential - final validation)
+    # Create the crew
+    crew = Crew(
+        agents=[
+            agents["company_researcher"],
+            agents["market_analyst"],
+            agents["financial_calculator"],
+            agents["risk_assessor"],
+            agents["report_compiler"]
+        ],
+        tasks=[
+            task_research_company,
+            task_analyze_market,
+            task_calculate_metrics,
+            task_assess_risks,
+            task_compile_report
+        ],
+        verbose=True
+    )
+    
+    return crew
+
+def _pipelined_crew(company_name: str, agents: Dict[str, "Agent"], analysis_tasks: List["Task"]):
+    """Analysis tasks each followed by an async task writing the report section drawn from it"""
+    from crewai import Task, Crew
+    writers = get_section_writers()
+    
+    tasks, section_tasks = [], []
+    for section, upstream in zip(PIPELINED_SECTIONS, analysis_tasks):
+        heading = REPORT_HEADINGS[section]
+        # Runs in its own thread while the next analysis task starts
+        section_task = Task(
+            description=f"""
+        Write the {heading} section of the investment report for: {company_name}
+        
+        Cover: {InvestmentReport.model_fields[section].description}
+        
+        Use the figures in the context as given. Return only the section text, without a heading.
+        """,
+            agent=writers[section],
+            context=[upstream],
+            async_execution=True,
+            expected_output=f"The {heading} section of the investment report"
+        )
+        tasks.extend([upstream, section_task])
+        section_tasks.append(section_task)
+    
+    # Joins the section threads; the report itself is only stitched together afterwards
+    task_summarize_report = Task(
+        description=f"""
+        Write the executive summary and recommendation of the investment report for: {company_name}
+        
+        Base them on the report sections in the context. Structure the answer in Markdown format with:
+        
+        ## Executive Summary
+        (Brief overview of findings)
+        
+        ## Investment Recommendation
+        (Buy/Hold/Sell recommendation with reasoning)
+        """,
+        agent=agents["report_compiler"],
+        context=section_tasks,
+        expected_output="The Executive Summary and Investment Recommendation sections in Markdown"
+    )
+    tasks.append(task_summarize_report)
+    
+    return Crew(
+        agents=[task.agent for task in analysis_tasks] + list(writers.values()) + [agents["report_compiler"]],
+        tasks=tasks,
+        verbose=True
+    )
+
+def assemble_report(company_name: str, sections: Dict[str, str]) -> str:
+    """Stitch pipelined sections into the Markdown layout of the compiled report"""
+    lines = [f"# Investment Analysis Report: {company_name}"]
+    for name, heading in REPORT_HEADINGS.items():
+        lines.extend(["", f"## {heading}", "", str(sections.get(name, "")).strip()])
+    return "\n".join(lines) + "\n"
+
+# Stage names of the crew's tasks, in order; shared with the ADK workflow
+CREW_STAGES = ["company_research", "market_analysis", "financial_calculation", "risk_assessment",
+               "report_compilation"]
+PIPELINED_CREW_STAGES = ["company_research", "section_company_overview", "market_analysis", "section_market_analysis",
+                         "financial_calculation", "section_financial_analysis", "risk_assessment",
+                         "section_risk_assessment", "report_summary"]
+
+STAGE_SECONDS = registry.histogram("fintech_stage_seconds", "Workflow stage latency", ["stage", "role"])
+STAGE_RESULTS = registry.counter("fintech_stages", "Finished workflow stages", ["stage", "outcome"])
+WORKFLOWS = registry.counter("fintech_workflows", "Finished workflow runs", ["outcome"])
+
+def _time_tasks(tasks: List["Task"], stages: List[str],
+                on_done: Callable = None) -> Tuple[Dict[str, float], Dict[str, Optional[str]]]:
+    """Time each task from its completion callback; returns (seconds, finish reason) per stage,
+    dicts that fill in as tasks finish
+
+    A sequential task starts when the previous sequential one ends, an async task when
+    its context tasks end. on_done(stage, task, seconds) runs after each task, in its thread
+    """
+    durations = {}
+    finish_reasons = {}
+    finished = {}
+    begin = time.time()
+    last = [begin]
+    for task, stage in zip(tasks, stages):
+        def done(output, task=task, stage=stage, role=task.agent.role):
+            now = time.time()
+            if task.async_execution:
+                start = max((finished.get(id(parent), begin) for parent in task.context or []), default=begin)
+            else:
+                start, last[0] = last[0], now
+            finished[id(task)] = now
+            durations[stage] = now - start
+            STAGE_SECONDS.labels(stage, role).observe(durations[stage])
+            STAGE_RESULTS.labels(stage, "ok").inc()
+            if on_done is not None:
+                on_done(stage, task, durations[stage])
+            # Read after the hooks, which may have rewritten the output, and cleared for the thread's next task
+            finish_reasons[stage] = thread_finish_reason()
+        task.callback = done
+    return durations, finish_reasons
+
+def _upstream(tasks: List["Task"], index: int) -> List["Task"]:
+    """Tasks whose output a task reads: its context, or else the previous sequential task"""
+    task = tasks[index]
+    if task.context:
+        return list(task.context)
+    # Async outputs are not passed along the sequence
+    return [parent for parent in tasks[:index] if not parent.async_execution][-1:]
+
+def _task_fingerprint(task: "Task", upstream_outputs: List[str]) -> str:
+    llm = task.agent.llm
+    return fingerprint(
+        task=task.description,
+        expected_output=task.expected_output,
+        inputs=upstream_outputs,
+        agent={"role": task.agent.role, "goal": task.agent.goal, "backstory": task.agent.backstory,
+               "tools": [tool.name for tool in task.agent.tools]},
+        model=llm.model_name,
+        params={"temperature": llm.temperature, "max_tokens": llm.max_tokens, "stop": llm.stop_sequences,
+                "deadline": llm.deadline, "fallback": llm.fallback_model},
+    )
+
+def _kickoff(crew: "Crew", stages: List[str], company_name: str,
+            on_done: Callable = None) -> Tuple[str, List[str], float]:
+    """Run a sequential crew, reusing tasks whose fingerprint is unchanged; returns (output, reused, seconds saved)"""
+    from crewai.tasks.task_output import TaskOutput
+    tasks = list(crew.tasks)
+    position = {id(task): index for index, task in enumerate(tasks)}
+    stage_fingerprints = get_stage_fingerprints()
+    reused, saved, changed = [], 0.0, set()
+    
+    if stage_fingerprints is not None:
+        for index, (task, stage) in enumerate(zip(tasks, stages)):
+            upstream = _upstream(tasks, index)
+            # Anything downstream of a re-run task runs again
+            if any(position[id(parent)] in changed for parent in upstream):
+                changed.add(index)
+                continue
+            key = _task_fingerprint(task, [parent.output.raw_output for parent in upstream])
+            cached = stage_fingerprints.lookup("crewai", company_name, stage, key)
+            if cached is None:
+                changed.add(index)
+                continue
+            task.output = TaskOutput(description=task.description, raw_output=cached["output"],
+                                     exported_output=cached["output"])
+            if task.async_execution:
+                # Dependents join an async context task's thread; a reused one is already done
+                task.thread = threading.Thread(target=lambda: None)
+                task.thread.start()
+            reused.append(stage)
+            saved += cached["seconds"]
+        if reused:
+            logger.info(f"Reusing unchanged tasks for {company_name}: {reused}")
+        # A re-run task that relied on the sequence now reads its reused predecessor explicitly
+        for index in changed:
+            upstream = _upstream(tasks, index)
+            if not tasks[index].context and upstream and position[id(upstream[0])] not in changed:
+                tasks[index].context = upstream
+        crew.tasks[:] = [tasks[index] for index in sorted(changed)]
+    
+    to_run = [index for index, stage in enumerate(stages) if stage not in reused]
+    durations, finish_reasons = _time_tasks([tasks[index] for index in to_run], [stages[index] for index in to_run], on_done)
+    output = str(crew.kickoff()) if to_run else tasks[-1].output.raw_output
+    
+    if stage_fingerprints is not None:
+        for index in to_run:
+            # An output cut at its deadline depends on server speed, so it is not offered for reuse
+            if finish_reasons.get(stages[index]) == "deadline":
+                continue
+            task = tasks[index]
+            upstream = [parent.output.raw_output for parent in _upstream(tasks, index)]
+            stage_fingerprints.record("crewai", company_name, stages[index], _task_fingerprint(task, upstream),
+                                      task.output.raw_output, durations.get(stages[index], 0.0))
+    return output, reused, saved
+
+def create_validation_crew(company_name: str, report: str, findings: str, escalated: bool = False):
+    """Crew for the LLM quality review, used when the rule checks do not pass
+
+    escalated runs the review on the validator's larger model
+    """
+    from crewai import Task, Crew
+    validator = get_escalated_agent("quality_validator") if escalated else get_agents()["quality_validator"]
+    
+    # Task 6: Quality Validation (only after the rule checks fail or are inconclusive)
     task_validate_quality = Task(
         description=f"""
         Validate the quality of the investment report for: {company_name}
         
+        Automated checks reported: {findings}
+        
         Review and verify:
         1. Accuracy of information presented
         2. Completeness of all required sections
@@ -241,61 +628,267 @@ def create_financial_analysis_crew(company_name: str):
         5. Logical flow and readability
         
         Provide validation feedback and confirm if the report meets quality standards.
+        End with 'VERDICT: PASS' if it does, otherwise 'VERDICT: FAIL' and the problems.
+        
+        Report:
+        {report}
         """,
-        agent=quality_validator,
-        context=[task_compile_report],
+        agent=validator,
         expected_output="Quality validation feedback and final approved report"
     )
     
-    # Create the crew
-    crew = Crew(
-        agents=[
-            company_researcher,
-            market_analyst,
-            financial_calculator,
-            risk_assessor,
-            report_compiler,
-            quality_validator
-        ],
-        tasks=[
-            task_research_company,
-            task_analyze_market,
-            task_calculate_metrics,
-            task_assess_risks,
-            task_compile_report,
-            task_validate_quality
-        ],
-        verbose=True
-    )
+    return Crew(agents=[validator], tasks=[task_validate_quality], verbose=True)
+
+def _record_routing(decisions: List[Dict[str, Any]], reason: str = "route") -> Callable:
+    """on_done hook logging which model each task ran on, its seconds, approximate tokens
+    and how its last generation ended"""
+    def on_done(stage: str, task: "Task", seconds: float):
+        decisions.append({"stage": stage, "role": task.agent.role, "model": task.agent.llm.model_name,
+                          "reason": reason, "seconds": seconds,
+                          # ~4 characters per token; the crew does not surface usage
+                          "tokens": len(task.output.raw_output) // 4,
+                          # Set in this thread by the task's last LLM call; _time_tasks clears it
+                          "finish_reason": thread_finish_reason(clear=False)})
+    return on_done
+
+def _chain(*hooks: Callable) -> Callable:
+    """One on_done hook running several in order"""
+    def on_done(stage: str, task: "Task", seconds: float):
+        for hook in hooks:
+            if hook is not None:
+                hook(stage, task, seconds)
+    return on_done
+
+def _section_checker(company_name: str, checks: Dict[str, Any]) -> Callable:
+    """on_done hook checking each pipelined section as it arrives; a failing one is rewritten once"""
+    from crewai.tasks.task_output import TaskOutput
+    reference = lookup_metrics(company_name)
     
-    return crew
+    def sections_of(stage: str, text: str) -> Dict[str, str]:
+        if stage == "report_summary":
+            parsed = parse_report(text)[1]
+            return {name: parsed.get(name, "") for name in SUMMARY_SECTIONS}
+        return {stage[len("section_"):]: text}
+    
+    def on_done(stage: str, task: "Task", seconds: float):
+        if stage != "report_summary" and not stage.startswith("section_"):
+            return
+        check = validate_sections(sections_of(stage, task.output.raw_output), reference)
+        retried = False
+        if not check.passed:
+            logger.warning(f"Section {stage} for {company_name} failed its check, rewriting: {check.issues}")
+            context = "\n".join(parent.output.raw_output for parent in task.context or [] if parent.output)
+            context += f"\n\nRule check findings on your previous answer: {'; '.join(check.issues)}"
+            raw = task.agent.execute_task(task=task, context=context, tools=task.tools)
+            task.output = TaskOutput(description=task.description, raw_output=raw, exported_output=raw)
+            check = validate_sections(sections_of(stage, raw), reference)
+            retried = True
+        checks[stage] = {**check.to_dict(), "retried": retried}
+    return on_done
+
+def uncapped_references() -> Dict[str, float]:
+    """Uncapped output length per agent role from the ADK execution journal, read once
+
+    The crew's roles share their names with the ADK agents, so uncapped ADK runs
+    (GENERATION_LIMITS=0) are the reference for both
+    """
+    with _lazy_lock:
+        if "references" not in _lazy:
+            path = os.getenv("EXECUTION_JOURNAL_PATH", "execution_journal.jsonl")
+            try:
+                with open(path, encoding="utf-8") as f:
+                    _lazy["references"] = reference_tokens(json.loads(line) for line in f if line.strip())
+            except (OSError, ValueError):
+                _lazy["references"] = {}
+        return _lazy["references"]
+
+def run_financial_analysis(company_name: str, as_of: str = None, pipelined: bool = None) -> Dict[str, Any]:
+    """Run the analysis crew, then validate: rule checks first, the LLM validator only if they do not pass"""
+    pipelined = PIPELINED_REPORT if pipelined is None else pipelined
+    stages = PIPELINED_CREW_STAGES if pipelined else CREW_STAGES
+    section_checks = {}
+    decisions = []
+    with tracer.span("analysis", framework="crewai", company=company_name):
+        with tracer.span("crew.kickoff", tasks=len(stages), pipelined=pipelined) as span:
+            crew = create_financial_analysis_crew(company_name, as_of, pipelined)
+            tasks = list(crew.tasks)
+            on_done = _chain(_section_checker(company_name, section_checks) if pipelined else None,
+                             _record_routing(decisions))
+            report, reused, saved = _kickoff(crew, stages, company_name, on_done)
+            if pipelined:
+                # Sections were checked as they arrived; assembly only stitches them
+                outputs = {stage: task.output.raw_output for task, stage in zip(tasks, stages)}
+                sections = {section: outputs[f"section_{section}"] for section in PIPELINED_SECTIONS}
+                summary = parse_report(outputs["report_summary"])[1]
+                sections.update({name: summary.get(name, "") for name in SUMMARY_SECTIONS})
+                report = assemble_report(company_name, sections)
+            span.set_attribute("reused_tasks", len(reused))
+        
+        with tracer.span("validation.rules") as span:
+            check = validate_report(report, lookup_metrics(company_name))
+            span.set_attribute("status", check.status)
+        if check.passed:
+            validation = check.to_dict()
+        else:
+            with tracer.span("crew.kickoff", tasks=1, validation=True):
+                crew = create_validation_crew(company_name, report, "; ".join(check.issues))
+                validation, reused_validation, saved_validation = _kickoff(crew, ["validation"], company_name,
+                                                                           _record_routing(decisions))
+                reused += reused_validation
+                saved += saved_validation
+            if reports_problem(validation) and route_for("Quality Validator").escalate_to:
+                # Only a review that fails the report or gives no verdict is worth the larger model
+                logger.info(f"Validator did not pass the report for {company_name}, escalating")
+                with tracer.span("crew.kickoff", tasks=1, validation=True, escalated=True):
+                    crew = create_validation_crew(company_name, report, "; ".join(check.issues), escalated=True)
+                    validation, reused_validation, saved_validation = _kickoff(
+                        crew, ["validation_escalated"], company_name, _record_routing(decisions, "escalated"))
+                    reused += reused_validation
+                    saved += saved_validation
+        WORKFLOWS.labels("ok").inc()
+    
+    routing = summarize_routing(decisions)
+    routing["routes"] = {role: route_for(role).to_dict() for role in sorted({d["role"] for d in decisions})}
+    logger.info(f"Routing for {company_name}: {len(routing['escalations'])} escalations "
+                f"(+{routing['escalation_seconds']:.2f}s), {routing['cost_units']:.2f} cost units "
+                f"vs {routing['baseline_cost_units']:.2f} on {DEFAULT_MODEL}")
+    limits = summarize_limits(decisions, uncapped_references())
+    logger.info(f"Generation limits for {company_name}: {len(limits['capped_stages'])} stages capped, "
+                f"~{limits['tokens_saved']:.0f} tokens / {limits['seconds_saved']:.1f}s saved")
+    
+    return {
+        "report": report,
+        "validation": validation,
+        "llm_validations_skipped": int(check.passed),
+        "stages_reused": reused,
+        "llm_seconds_saved": saved,
+        "section_checks": section_checks,
+        "routing": routing,
+        "generation_limits": limits
+    }
+
+def output_filename(company_name: str) -> str:
+    """Output file name for a company's Markdown report"""
+    return f"assignment1_output_{company_name.replace(' ', '_')}.md"
+
+def save_report(company_name: str, result: Dict[str, Any], output_file: str):
+    """Write the report, plus the LLM validator's review when it ran, as Markdown"""
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(f"# Financial Analysis Report: {company_name}\n\n")
+        f.write(result["report"])
+        if isinstance(result["validation"], str):
+            f.write(f"\n\n## Quality Validation\n\n{result['validation']}\n")
+
+def _init_worker():
+    """Process pool initializer: build the agents once, reused for every company in this worker"""
+    # SQLite connections inherited from the parent must not be used after fork; open our own on first use
+    with _lazy_lock:
+        _lazy.pop("response_cache", None)
+        _lazy.pop("stage_fingerprints", None)
+    # A forked worker starts with the parent's metric values; only its own work is sent back
+    registry.drain()
+    get_agents()
+
+def _analyze_to_file(company_name: str, output_dir: str, pipelined: bool = None) -> Dict[str, Any]:
+    """Worker task: analyze one company and write its Markdown report"""
+    start = time.time()
+    result = run_financial_analysis(company_name, pipelined=pipelined)
+    output_file = os.path.join(output_dir, output_filename(company_name))
+    save_report(company_name, result, output_file)
+    return {"output_file": output_file, "seconds": time.time() - start, "worker_pid": os.getpid(),
+            "llm_validations_skipped": result["llm_validations_skipped"], "metrics": registry.drain()}
+
+def run_batch(companies: List[str], max_workers: int = 4, output_dir: str = "outputs",
+              pipelined: bool = None) -> Dict[str, Any]:
+    """Run one crew per company in a process pool, writing each report as it finishes"""
+    manifest = BatchManifest(output_dir)
+    
+    logger.info(f"Starting batch of {len(companies)} companies with {max_workers} worker processes")
+    batch_start = time.time()
+    
+    # Each worker process keeps its own agents, LLM client and connection pool
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as executor:
+        futures = {executor.submit(_analyze_to_file, company, output_dir, pipelined): company for company in companies}
+        for future in as_completed(futures):
+            try:
+                outcome = future.result()
+                # Metrics recorded in the worker show up on this process's endpoint
+                registry.merge(outcome.pop("metrics"))
+                manifest.record(futures[future], outcome)
+            except Exception as e:
+                manifest.record(futures[future], error=e)
+    
+    results = manifest.results
+    wall_time = time.time() - batch_start
+    summary = {
+        "results": results,
+        "companies": len(companies),
+        "succeeded": len(results),
+        "wall_time": wall_time,
+        "companies_per_hour": len(results) * 3600 / wall_time if wall_time > 0 else 0.0,
+        "manifest": manifest.path,
+    }
+    logger.info(f"Batch completed: {len(results)}/{len(companies)} succeeded in {wall_time:.2f}s "
+                f"({summary['companies_per_hour']:.1f} companies/hour)")
+    return summary
+
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="FinTechAI CrewAI financial analysis")
+    parser.add_argument("companies", nargs="*", help="Companies to analyze (default: Tesla Inc)")
+    parser.add_argument("--companies-file", help="File with one company per line for batch mode")
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes in batch mode")
+    parser.add_argument("--output-dir", default="outputs", help="Directory for batch results")
+    parser.add_argument("--pipelined", action="store_true", default=None,
+                        help="Write and check report sections as their inputs finish (default PIPELINED_REPORT)")
+    return parser.parse_args(argv)
 
 def main():
     """Main execution function"""
+    args = parse_args()
+    start_metrics_server()
+    
     print("=" * 80)
     print("FinTechAI Research & Analysis Platform - Assignment 1")
     print("Multi-Agent Financial Research System using CrewAI")
     print("=" * 80)
     print()
     
+    companies = list(args.companies)
+    if args.companies_file:
+        with open(args.companies_file, 'r', encoding='utf-8') as f:
+            companies.extend(line.strip() for line in f if line.strip())
+    
+    if len(companies) > 1:
+        print(f"Starting batch analysis for {len(companies)} companies ({args.workers} worker processes)")
+        print(f"Reports are written to {args.output_dir}/ as each company finishes")
+        print()
+        summary = run_batch(companies, max_workers=args.workers, output_dir=args.output_dir,
+                            pipelined=args.pipelined)
+        print()
+        print("=" * 80)
+        print(f"Batch complete: {summary['succeeded']}/{summary['companies']} companies succeeded "
+              f"in {summary['wall_time']:.1f}s")
+        print(f"Throughput: {summary['companies_per_hour']:.1f} companies/hour")
+        print(f"Manifest: {summary['manifest']}")
+        print("=" * 80)
+        return
+    
     # Example: Analyze Tesla
-    company_name = "Tesla Inc"
+    company_name = companies[0] if companies else "Tesla Inc"
     
     print(f"Starting financial analysis for: {company_name}")
     print("This may take a few minutes...")
     print()
     
-    # Create and execute the crew
-    crew = create_financial_analysis_crew(company_name)
-    
-    # Execute the crew
-    result = crew.kickoff()
+    # Create and execute the crew, validating the report afterwards
+    result = run_financial_analysis(company_name, pipelined=args.pipelined)
     
     # Save the result
-    output_file = f"assignment1_output_{company_name.replace(' ', '_')}.md"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(f"# Financial Analysis Report: {company_name}\n\n")
-        f.write(str(result))
+    output_file = output_filename(company_name)
+    save_report(company_name, result, output_file)
+    
+    print(f"LLM validations skipped by rule checks: {result['llm_validations_skipped']}")
     
     print()
     print("=" * 80)
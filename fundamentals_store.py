@@ -0,0 +1,200 @@
+"""
+Memory-mapped fundamentals store
+A float64 matrix (one row per company, one column per metric) saved as .npy and
+opened with mmap, plus a JSON ticker/name index; lookups touch a single row
+
+Usage:
+    python fundamentals_store.py ingest fundamentals.csv --output fundamentals_store
+    python fundamentals_store.py query AAPL pe_ratio
+"""
+
+import os
+import json
+import time
+import logging
+import argparse
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from financial_metrics import NUMERIC_COLUMNS, LARGE_CAP, MID_CAP, compute_metrics, health_labels, \
+    load_fundamentals, normalize_name
+
+logger = logging.getLogger(__name__)
+
+VALUES_FILE = "values.npy"
+INDEX_FILE = "index.json"
+
+DERIVED_COLUMNS = ["pe_ratio", "revenue_growth", "profit_margin", "market_cap"]
+# Text metrics are derived from stored numbers on read
+TEXT_METRICS = ["market_cap_class", "financial_health"]
+
+
+def build_store(source: str, output: str) -> Dict[str, Any]:
+    """Ingest a CSV/Parquet fundamentals file into a memory-mappable store directory"""
+    start = time.time()
+    table = load_fundamentals(source)
+    metrics = compute_metrics(table)
+    columns = NUMERIC_COLUMNS + DERIVED_COLUMNS
+    values = np.column_stack([table[column] for column in NUMERIC_COLUMNS] +
+                             [metrics[column] for column in DERIVED_COLUMNS]).astype(np.float64)
+
+    tickers: Dict[str, int] = {}
+    names: Dict[str, int] = {}
+    for row, (ticker, name) in enumerate(zip(table["ticker"], table["company_name"])):
+        tickers.setdefault(ticker.upper(), row)
+        names.setdefault(normalize_name(name), row)
+
+    os.makedirs(output, exist_ok=True)
+    # Write to temp names and rename so readers never map a half-written store
+    values_tmp = os.path.join(output, VALUES_FILE + ".tmp")
+    index_tmp = os.path.join(output, INDEX_FILE + ".tmp")
+    with open(values_tmp, "wb") as f:
+        np.save(f, values)
+    with open(index_tmp, "w", encoding="utf-8") as f:
+        json.dump({
+            "columns": columns,
+            "tickers": tickers,
+            "names": names,
+            "row_tickers": [str(ticker) for ticker in table["ticker"]],
+            "company_names": [str(name) for name in table["company_name"]],
+            "source": os.path.abspath(source),
+            "built": time.time(),
+        }, f)
+    os.replace(values_tmp, os.path.join(output, VALUES_FILE))
+    os.replace(index_tmp, os.path.join(output, INDEX_FILE))
+
+    summary = {"rows": len(values), "columns": len(columns), "seconds": time.time() - start, "path": output}
+    logger.info(f"Built fundamentals store at {output}: {summary['rows']} rows in {summary['seconds']:.2f}s")
+    return summary
+
+
+def _version(index_path: str) -> tuple:
+    stat = os.stat(index_path)
+    return stat.st_ino, stat.st_mtime_ns
+
+
+class FundamentalsStore:
+    """Read-only view over a store directory; the matrix stays on disk until a row is read"""
+
+    def __init__(self, path: str):
+        self.path = path
+        index_path = os.path.join(path, INDEX_FILE)
+        # A rebuild replaces the index file, which changes this
+        self.version = _version(index_path)
+        with open(index_path, encoding="utf-8") as f:
+            index = json.load(f)
+        self.columns: List[str] = index["columns"]
+        self._column_index = {column: position for position, column in enumerate(self.columns)}
+        self._tickers: Dict[str, int] = index["tickers"]
+        self._names: Dict[str, int] = index["names"]
+        self._row_tickers: List[str] = index["row_tickers"]
+        self._company_names: List[str] = index["company_names"]
+        self.values = np.load(os.path.join(path, VALUES_FILE), mmap_mode="r")
+        if self.values.shape != (len(self._row_tickers), len(self.columns)):
+            raise ValueError(f"Fundamentals store at {path} has an index for {len(self._row_tickers)}x"
+                             f"{len(self.columns)} values but holds {self.values.shape}; rebuild it")
+
+    def __len__(self) -> int:
+        return self.values.shape[0]
+
+    @property
+    def metrics(self) -> List[str]:
+        return self.columns + TEXT_METRICS
+
+    def resolve(self, company: str) -> Optional[int]:
+        """Row for a ticker or company name, or None"""
+        row = self._tickers.get(str(company).strip().upper())
+        if row is None:
+            row = self._names.get(normalize_name(company))
+        return row
+
+    def _value(self, row: int, metric: str) -> Any:
+        if metric == "market_cap_class":
+            cap = self._value(row, "market_cap")
+            if cap is None or cap <= 0:
+                return "Unknown"
+            return "Large" if cap >= LARGE_CAP else "Mid" if cap >= MID_CAP else "Small"
+        if metric == "financial_health":
+            pe = self.values[row, self._column_index["pe_ratio"]]
+            growth = self.values[row, self._column_index["revenue_growth"]]
+            return str(health_labels(pe, growth))
+
+        value = float(self.values[row, self._column_index[metric]])
+        return None if np.isnan(value) else value
+
+    def get_metric(self, company: str, metric: str) -> Optional[Any]:
+        """One metric for a ticker or company name; None when either is unknown"""
+        if metric not in self._column_index and metric not in TEXT_METRICS:
+            raise KeyError(f"Unknown metric '{metric}'; available: {self.metrics}")
+        row = self.resolve(company)
+        if row is None:
+            return None
+        return self._value(row, metric)
+
+    def get_metrics(self, company: str) -> Optional[Dict[str, Any]]:
+        """Every metric for one company"""
+        row = self.resolve(company)
+        if row is None:
+            return None
+        result = {"ticker": self._row_tickers[row], "company_name": self._company_names[row]}
+        result.update({metric: self._value(row, metric) for metric in self.metrics})
+        return result
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_fundamentals_store() -> Optional[FundamentalsStore]:
+    """Shared store at FUNDAMENTALS_STORE, reopened after a rebuild, or None when it has not been built"""
+    global _store
+    path = os.getenv("FUNDAMENTALS_STORE", "fundamentals_store")
+    index_path = os.path.join(path, INDEX_FILE)
+    if not os.path.exists(index_path):
+        return None
+    with _store_lock:
+        if _store is None or _store.path != path or _store.version != _version(index_path):
+            _store = FundamentalsStore(path)
+        return _store
+
+
+def get_metric(ticker: str, metric: str) -> Optional[Any]:
+    """Module-level lookup against the shared store"""
+    store = get_fundamentals_store()
+    return store.get_metric(ticker, metric) if store else None
+
+
+def lookup_fundamentals(company_name: str) -> Optional[Dict[str, Any]]:
+    """Agent tool: stored fundamentals for a company, rounded for the prompt"""
+    store = get_fundamentals_store()
+    metrics = store.get_metrics(company_name) if store else None
+    if metrics is None:
+        return None
+    return {key: round(value, 2) if isinstance(value, float) else value for key, value in metrics.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query the fundamentals store")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest = commands.add_parser("ingest", help="Build the store from a CSV or Parquet file")
+    ingest.add_argument("source")
+    ingest.add_argument("--output", default=os.getenv("FUNDAMENTALS_STORE", "fundamentals_store"))
+    query = commands.add_parser("query", help="Look up one metric (or all with no metric)")
+    query.add_argument("ticker")
+    query.add_argument("metric", nargs="?")
+    query.add_argument("--store", default=os.getenv("FUNDAMENTALS_STORE", "fundamentals_store"))
+    args = parser.parse_args(argv)
+
+    if args.command == "ingest":
+        print(json.dumps(build_store(args.source, args.output), indent=2))
+    else:
+        store = FundamentalsStore(args.store)
+        result = store.get_metric(args.ticker, args.metric) if args.metric else store.get_metrics(args.ticker)
+        print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
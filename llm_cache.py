@@ -0,0 +1,189 @@
+"""
+Content-addressed LLM response cache
+SQLite-backed store with TTL expiry, LRU eviction and hit/miss counters, and an
+adapter for LangChain's cache interface
+"""
+
+import os
+import json
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+CACHE_LOOKUPS = registry.counter("fintech_llm_cache_lookups", "LLM response cache lookups", ["result"])
+
+
+def _prompt_payload(prompt: Any) -> Any:
+    """Normalize a prompt (string or list of messages) for hashing"""
+    if isinstance(prompt, str):
+        return prompt
+    if isinstance(prompt, (list, tuple)):
+        return [
+            [getattr(message, "type", "text"), getattr(message, "content", str(message))]
+            for message in prompt
+        ]
+    return str(prompt)
+
+
+class LLMResponseCache:
+    """On-disk cache of LLM completions keyed by a hash of the request"""
+
+    def __init__(self, path: str = "llm_cache.db", ttl_seconds: float = 86400, max_entries: int = 10000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model: str, temperature: float, prompt: Any, **params) -> str:
+        """Hash of everything that determines the completion"""
+        payload = {
+            "model": model,
+            "temperature": temperature,
+            "prompt": _prompt_payload(prompt),
+            "params": params,
+        }
+        encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return a cached value, or None on a miss or expired entry"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                CACHE_LOOKUPS.labels("miss").inc()
+                return None
+
+            if self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self.misses += 1
+                CACHE_LOOKUPS.labels("expired").inc()
+                return None
+
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            CACHE_LOOKUPS.labels("hit").inc()
+            return row[0]
+
+    def set(self, key: str, value: str):
+        """Store a value and evict least recently used entries over the cap"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+
+            count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY accessed ASC LIMIT ?)",
+                    (overflow,),
+                )
+                self.evictions += overflow
+            self._conn.commit()
+
+    def clear(self):
+        """Remove every entry"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+        }
+
+
+def _define_langchain_cache():
+    from langchain_core.caches import BaseCache
+    from langchain_core.load import dumps, loads
+
+    class LangChainLLMCache(BaseCache):
+        """Adapter exposing LLMResponseCache through LangChain's cache interface"""
+
+        def __init__(self, cache: LLMResponseCache):
+            self.cache = cache
+
+        def _key(self, prompt: str, llm_string: str) -> str:
+            return hashlib.sha256(f"{llm_string}\n{prompt}".encode("utf-8")).hexdigest()
+
+        def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence]:
+            value = self.cache.get(self._key(prompt, llm_string))
+            if value is None:
+                return None
+            return [loads(generation) for generation in json.loads(value)]
+
+        def update(self, prompt: str, llm_string: str, return_val: Sequence):
+            # An answer cut at its deadline depends on server speed, not the prompt
+            if any((generation.generation_info or {}).get("finish_reason") == "deadline"
+                   for generation in return_val):
+                return
+            value = json.dumps([dumps(generation) for generation in return_val])
+            self.cache.set(self._key(prompt, llm_string), value)
+
+        def clear(self, **kwargs: Any):
+            self.cache.clear()
+
+    return LangChainLLMCache
+
+
+def cache_from_env() -> Optional[LLMResponseCache]:
+    """Build the shared cache when LLM_CACHE_PATH is set, otherwise None"""
+    path = os.getenv("LLM_CACHE_PATH")
+    if not path:
+        return None
+
+    cache = LLMResponseCache(
+        path=path,
+        ttl_seconds=float(os.getenv("LLM_CACHE_TTL", "86400")),
+        max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000")),
+    )
+    logger.info(f"LLM response cache enabled at {path}")
+    return cache
+
+
+def __getattr__(name: str) -> Any:
+    # LangChainLLMCache subclasses a langchain class, so it is defined when first requested
+    if name == "LangChainLLMCache":
+        globals()[name] = _define_langchain_cache()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
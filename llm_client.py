@@ -0,0 +1,959 @@
+"""
+Connection-pooled, rate-limited client for Ollama's OpenAI-compatible API
+One HTTP connection pool, a concurrency limit per model, a token-bucket rate
+limiter, jittered retries and load spreading across several Ollama endpoints.
+openai, httpx and langchain_openai are imported on first use
+"""
+
+import os
+import copy
+import json
+import time
+import queue
+import random
+import hashlib
+import asyncio
+import logging
+import threading
+import weakref
+import contextvars
+from collections import deque
+from concurrent.futures import Future
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+from metrics import registry
+from tracing import tracer
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ENDPOINT = "http://localhost:11434/v1"
+
+LLM_REQUESTS = registry.counter("fintech_llm_requests", "Completed LLM requests", ["model"])
+LLM_REQUEST_SECONDS = registry.histogram("fintech_llm_request_seconds",
+                                         "LLM request latency including queueing", ["model"])
+LLM_ERRORS = registry.counter("fintech_llm_errors", "LLM requests that failed after retries", ["model", "error"])
+LLM_RETRIES = registry.counter("fintech_llm_retries", "Retried LLM attempts", ["model"])
+LLM_FALLBACKS = registry.counter("fintech_llm_fallbacks", "Failed requests retried on a fallback model",
+                                 ["model", "fallback"])
+LLM_DEADLINES = registry.counter("fintech_llm_deadlines", "Generations cut off at their deadline", ["model"])
+
+# How the latest generation in this task ended: "stop", "length" (max tokens) or
+# "deadline"; None for cache hits. Set by PooledChatOpenAI and the ADK wrapper
+last_finish_reason: ContextVar[Optional[str]] = ContextVar("last_finish_reason", default=None)
+# The same per thread: langchain runnables (CrewAI's agent executor) call the model in a
+# copy of the context, so a value set there never reaches the caller's context
+_thread_finish = threading.local()
+
+
+def _record_finish(reason: Optional[str]):
+    last_finish_reason.set(reason)
+    _thread_finish.reason = reason
+
+
+def thread_finish_reason(clear: bool = True) -> Optional[str]:
+    """How the latest generation in this thread ended; cleared once read unless clear is False"""
+    reason = getattr(_thread_finish, "reason", None)
+    if clear:
+        _thread_finish.reason = None
+    return reason
+
+
+# Yielded by _read_within in place of a chunk once the deadline has passed
+_DEADLINE = object()
+
+
+class _StreamCut:
+    """Cleanups registered while _read_within's helper thread reads a stream, run once the
+    caller gives up on it: the limiter slot is released and the connection shut down"""
+
+    def __init__(self):
+        self.fired = False
+        self._cleanups = []
+        self._lock = threading.Lock()
+
+    def add(self, cleanup: Callable[[], None]):
+        with self._lock:
+            if not self.fired:
+                self._cleanups.append(cleanup)
+                return
+        cleanup()
+
+    def fire(self):
+        with self._lock:
+            self.fired = True
+            cleanups, self._cleanups = self._cleanups, []
+        for cleanup in cleanups:
+            try:
+                cleanup()
+            except Exception as e:
+                logger.debug(f"Stream cleanup failed: {e}")
+
+
+# Set in the helper thread's context, so the stream it reads can register its cleanups
+_stream_cut: ContextVar[Optional[_StreamCut]] = ContextVar("_stream_cut", default=None)
+
+
+def _cut_response_on_deadline(response):
+    """httpx response hook: a stream abandoned at its deadline has its socket shut down, which
+    wakes the helper thread's blocked read instead of leaving it to drain a stalled server"""
+    cut = _stream_cut.get()
+    if cut is None:
+        return
+
+    def shutdown():
+        import socket
+        stream = response.extensions.get("network_stream")
+        sock = stream.get_extra_info("socket") if stream is not None else None
+        if sock is not None:
+            sock.shutdown(socket.SHUT_RDWR)
+
+    cut.add(shutdown)
+
+
+def _read_within(chunks: Iterator, ends: float) -> Iterator:
+    """Yield chunks until time.monotonic() reaches ends, then _DEADLINE. A helper thread reads the
+    stream so a stalled server cannot block the caller; once the caller stops reading, the stream's
+    limiter slot is released and its connection shut down"""
+    pending = queue.Queue()
+    stop = threading.Event()
+    cut = _StreamCut()
+
+    def read():
+        _stream_cut.set(cut)
+        try:
+            for chunk in chunks:
+                pending.put(("chunk", chunk))
+                if stop.is_set():
+                    return
+            pending.put(("done", None))
+        except BaseException as e:
+            pending.put(("error", e))
+        finally:
+            chunks.close()
+
+    threading.Thread(target=contextvars.copy_context().run, args=(read,), daemon=True).start()
+    try:
+        while True:
+            try:
+                kind, value = pending.get(timeout=max(ends - time.monotonic(), 0))
+            except queue.Empty:
+                yield _DEADLINE
+                return
+            if kind == "done":
+                return
+            if kind == "error":
+                raise value
+            yield value
+    finally:
+        stop.set()
+        cut.fire()
+
+
+def _once(fn: Callable[[], None]) -> Callable[[], None]:
+    """fn wrapped to run at most once, from whichever thread calls it first"""
+    lock = threading.Lock()
+    called = []
+
+    def call():
+        with lock:
+            if called:
+                return
+            called.append(True)
+        fn()
+
+    return call
+
+_retryable_errors = None
+
+
+def retryable_errors() -> Tuple[type, ...]:
+    """Errors worth retrying: the server was unreachable, overloaded or failed transiently"""
+    global _retryable_errors
+    if _retryable_errors is None:
+        import openai
+        _retryable_errors = (
+            openai.APIConnectionError,
+            openai.APITimeoutError,
+            openai.RateLimitError,
+            openai.InternalServerError,
+        )
+    return _retryable_errors
+
+
+class ConcurrencyLimiter:
+    """FIFO slot limiter usable from threads and event loops at the same time"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.max_queue_depth = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def _try_acquire_locked(self) -> bool:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return True
+        return False
+
+    def _enqueue_locked(self, waiter):
+        self._waiters.append(waiter)
+        self.max_queue_depth = max(self.max_queue_depth, len(self._waiters))
+
+    def acquire(self):
+        with self._lock:
+            if self._try_acquire_locked():
+                return
+            event = threading.Event()
+            self._enqueue_locked((None, event))
+        # release() hands the slot over directly, so there is nothing to re-check
+        event.wait()
+
+    async def aacquire(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._try_acquire_locked():
+                return
+            future = loop.create_future()
+            waiter = (loop, future)
+            self._enqueue_locked(waiter)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    raise
+            # The slot was handed over just before cancellation; pass it on
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def _wake(self, future):
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+
+    def release(self):
+        with self._lock:
+            while self._waiters:
+                loop, waiter = self._waiters.popleft()
+                if loop is None:
+                    waiter.set()
+                    return
+                if not loop.is_closed():
+                    loop.call_soon_threadsafe(self._wake, waiter)
+                    return
+            self.active -= 1
+
+
+class TokenBucket:
+    """Token-bucket rate limiter; a rate of 0 disables limiting"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.waiting = 0
+        self.total_wait = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token, returning how long the caller must wait for it"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self.tokens -= 1
+            wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+            self.total_wait += wait
+            return wait
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        wait = self._reserve()
+        if wait > 0:
+            self.waiting += 1
+            try:
+                time.sleep(wait)
+            finally:
+                self.waiting -= 1
+
+    async def aacquire(self):
+        if self.rate <= 0:
+            return
+        wait = self._reserve()
+        if wait > 0:
+            self.waiting += 1
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self.waiting -= 1
+
+
+class _LeaderCancelled(Exception):
+    """The caller doing the shared generation was cancelled; followers retry"""
+
+
+class SingleFlight:
+    """Coalesce concurrent identical requests onto one in-flight call"""
+
+    def __init__(self):
+        self.leaders = 0
+        self.deduplicated = 0
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def _join(self, key: str) -> Tuple[Future, bool]:
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.deduplicated += 1
+                return future, False
+            future = self._inflight[key] = Future()
+            self.leaders += 1
+            return future, True
+
+    def _finish(self, key: str, future: Future, result: Any = None, error: BaseException = None):
+        with self._lock:
+            self._inflight.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        while True:
+            future, leader = self._join(key)
+            if not leader:
+                try:
+                    return copy.deepcopy(future.result())
+                except _LeaderCancelled:
+                    continue
+            try:
+                result = fn()
+            except BaseException as e:
+                self._finish(key, future, error=e)
+                raise
+            self._finish(key, future, result)
+            return result
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable]) -> Any:
+        while True:
+            future, leader = self._join(key)
+            if not leader:
+                try:
+                    # shield: a cancelled follower must not cancel the shared call
+                    return copy.deepcopy(await asyncio.shield(asyncio.wrap_future(future)))
+                except _LeaderCancelled:
+                    continue
+            try:
+                result = await fn()
+            except asyncio.CancelledError:
+                self._finish(key, future, error=_LeaderCancelled())
+                raise
+            except Exception as e:
+                self._finish(key, future, error=e)
+                raise
+            self._finish(key, future, result)
+            return result
+
+
+class Endpoint:
+    """One Ollama server and its load/health counters"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.unhealthy_until = 0.0
+
+
+class SharedLLMClient:
+    """Process-wide LLM client shared by every agent in both frameworks"""
+
+    def __init__(self, endpoints: List[str] = None, api_key: str = "ollama", max_concurrency_per_model: int = 4,
+                 model_concurrency: Dict[str, int] = None, requests_per_second: float = 0.0,
+                 burst: float = None, max_retries: int = 3, backoff_base: float = 0.5,
+                 backoff_max: float = 8.0, timeout: float = 600.0, pool_size: int = 32,
+                 unhealthy_cooldown: float = 10.0, coalesce: bool = True):
+        self.endpoints = [Endpoint(url) for url in (endpoints or [DEFAULT_ENDPOINT])]
+        self.api_key = api_key
+        self.max_concurrency_per_model = max_concurrency_per_model
+        self.model_concurrency = model_concurrency or {}
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.unhealthy_cooldown = unhealthy_cooldown
+        self.bucket = TokenBucket(requests_per_second, burst)
+        self.single_flight = SingleFlight() if coalesce else None
+        self.retries = 0
+        self.errors = 0
+        self.fallbacks = 0
+        import httpx
+        self._limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self._http = httpx.Client(limits=self._limits, timeout=timeout,
+                                  event_hooks={"response": [_cut_response_on_deadline]})
+        # httpx async pools are bound to the event loop that first used them; aclose_loop releases one
+        self._async_http = weakref.WeakKeyDictionary()
+        self._models: Dict[Tuple, "ChatOpenAI"] = {}
+        self._async_models = weakref.WeakKeyDictionary()
+        self._limiters: Dict[str, ConcurrencyLimiter] = {}
+        self._next = 0
+        self._lock = threading.Lock()
+
+    # ---------- endpoints and models ----------
+
+    def _limiter(self, model: str) -> ConcurrencyLimiter:
+        with self._lock:
+            if model not in self._limiters:
+                limit = self.model_concurrency.get(model, self.max_concurrency_per_model)
+                self._limiters[model] = ConcurrencyLimiter(limit)
+            return self._limiters[model]
+
+    def _pick_endpoint(self, exclude: Optional[Endpoint] = None) -> Endpoint:
+        """Least in-flight healthy endpoint, rotating between ties"""
+        with self._lock:
+            now = time.monotonic()
+            candidates = [e for e in self.endpoints if e is not exclude and e.unhealthy_until <= now]
+            if not candidates:
+                candidates = [e for e in self.endpoints if e is not exclude] or self.endpoints
+            self._next += 1
+            rotated = candidates[self._next % len(candidates):] + candidates[:self._next % len(candidates)]
+            endpoint = min(rotated, key=lambda e: e.in_flight)
+            endpoint.in_flight += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def _done(self, endpoint: Endpoint, failed: bool = False):
+        with self._lock:
+            endpoint.in_flight -= 1
+            if failed:
+                endpoint.failures += 1
+                endpoint.unhealthy_until = time.monotonic() + self.unhealthy_cooldown
+
+    def _model(self, endpoint: Endpoint, params: Dict[str, Any]) -> "ChatOpenAI":
+        import openai
+        from langchain_openai import ChatOpenAI
+        key = (endpoint.url, tuple(sorted((k, repr(v)) for k, v in params.items())))
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                model = ChatOpenAI(openai_api_key=self.api_key, openai_api_base=endpoint.url,
+                                   max_retries=0, request_timeout=self.timeout, **params)
+                # Route the sync client through the shared connection pool
+                model.client = openai.OpenAI(api_key=self.api_key, base_url=endpoint.url, max_retries=0,
+                                             http_client=self._http).chat.completions
+                self._models[key] = model
+            return model
+
+    def _async_model(self, endpoint: Endpoint, params: Dict[str, Any]) -> "ChatOpenAI":
+        import httpx
+        import openai
+        from langchain_openai import ChatOpenAI
+        loop = asyncio.get_running_loop()
+        key = (endpoint.url, tuple(sorted((k, repr(v)) for k, v in params.items())))
+        with self._lock:
+            models = self._async_models.setdefault(loop, {})
+            model = models.get(key)
+            if model is None:
+                http = self._async_http.get(loop)
+                if http is None:
+                    http = self._async_http[loop] = httpx.AsyncClient(limits=self._limits, timeout=self.timeout)
+                base = self._models.get(key)
+                model = ChatOpenAI(openai_api_key=self.api_key, openai_api_base=endpoint.url,
+                                   max_retries=0, request_timeout=self.timeout, **params) if base is None else base.copy()
+                model.async_client = openai.AsyncOpenAI(api_key=self.api_key, base_url=endpoint.url, max_retries=0,
+                                                        http_client=http).chat.completions
+                models[key] = model
+            return model
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter keeps retrying clients from synchronising
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _observe(self, model: str, queued: float):
+        LLM_REQUESTS.labels(model).inc()
+        LLM_REQUEST_SECONDS.labels(model).observe(time.time() - queued)
+
+    def _retry_or_raise(self, error: Exception, attempt: int, model: str) -> float:
+        if not isinstance(error, retryable_errors()) or attempt >= self.max_retries:
+            with self._lock:
+                self.errors += 1
+            LLM_ERRORS.labels(model, type(error).__name__).inc()
+            raise error
+        with self._lock:
+            self.retries += 1
+        LLM_RETRIES.labels(model).inc()
+        delay = self._backoff(attempt)
+        logger.warning(f"LLM request for {model} failed ({type(error).__name__}), retrying in {delay:.2f}s")
+        return delay
+
+    def record_fallback(self, model: str, fallback: str, error: Exception):
+        with self._lock:
+            self.fallbacks += 1
+        LLM_FALLBACKS.labels(model, fallback).inc()
+        logger.warning(f"LLM request for {model} failed ({type(error).__name__}), falling back to {fallback}")
+
+    # ---------- request paths ----------
+
+    @staticmethod
+    def request_key(params: Dict[str, Any], messages: List[Any], stop: Optional[List[str]] = None,
+                    **kwargs) -> str:
+        """Hash identifying identical generation requests"""
+        payload = {
+            "params": params,
+            "messages": [[getattr(m, "type", "text"), getattr(m, "content", str(m))] for m in messages],
+            "stop": stop,
+            "kwargs": kwargs,
+        }
+        encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def coalesced_call(self, key: str, params: Dict[str, Any], fn: Callable[["ChatOpenAI"], Any]) -> Any:
+        """call(), sharing one generation between concurrent identical requests"""
+        if self.single_flight is None:
+            return self.call(params, fn)
+        return self.single_flight.do(key, lambda: self.call(params, fn))
+
+    async def coalesced_acall(self, key: str, params: Dict[str, Any], fn: Callable[["ChatOpenAI"], Awaitable]) -> Any:
+        """Async variant of coalesced_call()"""
+        if self.single_flight is None:
+            return await self.acall(params, fn)
+        return await self.single_flight.ado(key, lambda: self.acall(params, fn))
+
+    def coalesce(self, key: str, fn: Callable[[], Any]) -> Any:
+        """fn(), sharing its result between concurrent identical requests"""
+        if self.single_flight is None:
+            return fn()
+        return self.single_flight.do(key, fn)
+
+    async def acoalesce(self, key: str, fn: Callable[[], Awaitable]) -> Any:
+        """Async variant of coalesce()"""
+        if self.single_flight is None:
+            return await fn()
+        return await self.single_flight.ado(key, fn)
+
+    def call(self, params: Dict[str, Any], fn: Callable[["ChatOpenAI"], Any]) -> Any:
+        """Run fn against an endpoint model under the limits, retrying transient failures"""
+        limiter = self._limiter(params["model_name"])
+        with tracer.span("llm.http", activate=False, model=params["model_name"], stream=False) as span:
+            queued = time.time()
+            limiter.acquire()
+            span.set_attribute("queue_wait", time.time() - queued)
+            try:
+                endpoint = None
+                for attempt in range(self.max_retries + 1):
+                    self.bucket.acquire()
+                    endpoint = self._pick_endpoint(exclude=endpoint if len(self.endpoints) > 1 else None)
+                    span.set_attributes(endpoint=endpoint.url, attempts=attempt + 1)
+                    try:
+                        result = fn(self._model(endpoint, params))
+                        self._done(endpoint)
+                        self._observe(params["model_name"], queued)
+                        return result
+                    except Exception as e:
+                        self._done(endpoint, failed=isinstance(e, retryable_errors()))
+                        time.sleep(self._retry_or_raise(e, attempt, params["model_name"]))
+            finally:
+                limiter.release()
+
+    async def acall(self, params: Dict[str, Any], fn: Callable[["ChatOpenAI"], Awaitable]) -> Any:
+        """Async variant of call()"""
+        limiter = self._limiter(params["model_name"])
+        with tracer.span("llm.http", activate=False, model=params["model_name"], stream=False) as span:
+            queued = time.time()
+            await limiter.aacquire()
+            span.set_attribute("queue_wait", time.time() - queued)
+            try:
+                endpoint = None
+                for attempt in range(self.max_retries + 1):
+                    await self.bucket.aacquire()
+                    endpoint = self._pick_endpoint(exclude=endpoint if len(self.endpoints) > 1 else None)
+                    span.set_attributes(endpoint=endpoint.url, attempts=attempt + 1)
+                    try:
+                        result = await fn(self._async_model(endpoint, params))
+                        self._done(endpoint)
+                        self._observe(params["model_name"], queued)
+                        return result
+                    except asyncio.CancelledError:
+                        self._done(endpoint)
+                        raise
+                    except Exception as e:
+                        self._done(endpoint, failed=isinstance(e, retryable_errors()))
+                        await asyncio.sleep(self._retry_or_raise(e, attempt, params["model_name"]))
+            finally:
+                limiter.release()
+
+    def stream(self, params: Dict[str, Any], fn: Callable[["ChatOpenAI"], Iterator]) -> Iterator:
+        """Stream from an endpoint; retries only happen before the first chunk"""
+        limiter = self._limiter(params["model_name"])
+        with tracer.span("llm.http", activate=False, model=params["model_name"], stream=True) as span:
+            queued = time.time()
+            limiter.acquire()
+            span.set_attribute("queue_wait", time.time() - queued)
+            # A stream read through _read_within gives its slot back as soon as its deadline passes
+            release = _once(limiter.release)
+            cut = _stream_cut.get()
+            if cut is not None:
+                cut.add(release)
+            try:
+                endpoint = None
+                for attempt in range(self.max_retries + 1):
+                    self.bucket.acquire()
+                    endpoint = self._pick_endpoint(exclude=endpoint if len(self.endpoints) > 1 else None)
+                    span.set_attributes(endpoint=endpoint.url, attempts=attempt + 1)
+                    started = False
+                    try:
+                        for chunk in fn(self._model(endpoint, params)):
+                            started = True
+                            yield chunk
+                        self._done(endpoint)
+                        self._observe(params["model_name"], queued)
+                        return
+                    except GeneratorExit:
+                        self._done(endpoint)
+                        raise
+                    except Exception as e:
+                        self._done(endpoint, failed=isinstance(e, retryable_errors()))
+                        if started:
+                            raise
+                        time.sleep(self._retry_or_raise(e, attempt, params["model_name"]))
+            finally:
+                release()
+
+    async def astream(self, params: Dict[str, Any], fn: Callable[["ChatOpenAI"], Any]):
+        """Async variant of stream()"""
+        limiter = self._limiter(params["model_name"])
+        with tracer.span("llm.http", activate=False, model=params["model_name"], stream=True) as span:
+            queued = time.time()
+            await limiter.aacquire()
+            span.set_attribute("queue_wait", time.time() - queued)
+            try:
+                endpoint = None
+                for attempt in range(self.max_retries + 1):
+                    await self.bucket.aacquire()
+                    endpoint = self._pick_endpoint(exclude=endpoint if len(self.endpoints) > 1 else None)
+                    span.set_attributes(endpoint=endpoint.url, attempts=attempt + 1)
+                    started = False
+                    try:
+                        async for chunk in fn(self._async_model(endpoint, params)):
+                            started = True
+                            yield chunk
+                        self._done(endpoint)
+                        self._observe(params["model_name"], queued)
+                        return
+                    except (GeneratorExit, asyncio.CancelledError):
+                        self._done(endpoint)
+                        raise
+                    except Exception as e:
+                        self._done(endpoint, failed=isinstance(e, retryable_errors()))
+                        if started:
+                            raise
+                        await asyncio.sleep(self._retry_or_raise(e, attempt, params["model_name"]))
+            finally:
+                limiter.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, in-flight and retry counters"""
+        with self._lock:
+            return {
+                "models": {
+                    model: {
+                        "limit": limiter.limit,
+                        "active": limiter.active,
+                        "queue_depth": limiter.queue_depth,
+                        "max_queue_depth": limiter.max_queue_depth,
+                    }
+                    for model, limiter in self._limiters.items()
+                },
+                "endpoints": {
+                    endpoint.url: {
+                        "in_flight": endpoint.in_flight,
+                        "requests": endpoint.requests,
+                        "failures": endpoint.failures,
+                    }
+                    for endpoint in self.endpoints
+                },
+                "rate_limit_waiting": self.bucket.waiting,
+                "rate_limit_wait_seconds": self.bucket.total_wait,
+                "retries": self.retries,
+                "errors": self.errors,
+                "fallbacks": self.fallbacks,
+                "coalesced": {
+                    "leaders": self.single_flight.leaders if self.single_flight else 0,
+                    "deduplicated": self.single_flight.deduplicated if self.single_flight else 0,
+                },
+            }
+
+    def close(self):
+        self._http.close()
+
+    async def aclose_loop(self):
+        """Close the async pool bound to the running loop; call before a short-lived loop ends"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            http = self._async_http.pop(loop, None)
+            self._async_models.pop(loop, None)
+        if http is not None:
+            await http.aclose()
+
+
+_shared_client = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_client() -> SharedLLMClient:
+    """Process-wide client configured from the environment on first use"""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            endpoints = [url.strip() for url in os.getenv("OLLAMA_BASE_URL", DEFAULT_ENDPOINT).split(",") if url.strip()]
+            _shared_client = SharedLLMClient(
+                endpoints=endpoints,
+                max_concurrency_per_model=int(os.getenv("LLM_MAX_CONCURRENCY", "4")),
+                requests_per_second=float(os.getenv("LLM_REQUESTS_PER_SECOND", "0")),
+                burst=float(os.getenv("LLM_BURST", "0")) or None,
+                max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+                coalesce=os.getenv("LLM_COALESCE", "1") != "0",
+            )
+            logger.info(f"Shared LLM client: endpoints={endpoints}")
+        return _shared_client
+
+
+async def aclose_loop_pool():
+    """Close the shared client's async pool for the running loop, if the client exists"""
+    if _shared_client is not None:
+        await _shared_client.aclose_loop()
+
+
+def _limiter_gauge(attribute: str) -> Dict[Tuple[str, ...], float]:
+    client = _shared_client
+    if client is None:
+        return {}
+    with client._lock:
+        return {(model,): getattr(limiter, attribute) for model, limiter in client._limiters.items()}
+
+
+registry.gauge("fintech_llm_queue_depth", "Requests waiting for a per-model concurrency slot", ["model"],
+               callback=lambda: _limiter_gauge("queue_depth"))
+registry.gauge("fintech_llm_in_flight", "Requests holding a per-model concurrency slot", ["model"],
+               callback=lambda: _limiter_gauge("active"))
+
+
+def _define_pooled_chat_openai():
+    from langchain_openai import ChatOpenAI
+
+    class PooledChatOpenAI(ChatOpenAI):
+        """ChatOpenAI whose requests go through the shared client's pool and limits"""
+        # Model asked once more when a request to model_name fails (after its retries)
+        fallback_model: Optional[str] = None
+        # Stop sequences added to the ones a caller binds (CrewAI binds "\nObservation")
+        stop_sequences: Optional[List[str]] = None
+        # Seconds from sending the request; the text generated by then is kept
+        deadline: Optional[float] = None
+
+        def _stop(self, stop: Optional[List[str]]) -> Optional[List[str]]:
+            if not self.stop_sequences:
+                return stop
+            return list(stop or []) + [sequence for sequence in self.stop_sequences if sequence not in (stop or [])]
+
+        def _deadline_chunk(self):
+            from langchain_core.messages import AIMessageChunk
+            from langchain_core.outputs import ChatGenerationChunk
+            LLM_DEADLINES.labels(self.model_name).inc()
+            return ChatGenerationChunk(message=AIMessageChunk(content=""), generation_info={"finish_reason": "deadline"})
+
+        def _finish(self, chunks: Iterator) -> Iterator:
+            """Pass chunks through, recording how the stream ended; once the deadline (counted from
+            sending the request) passes, the request is dropped and the text so far is kept"""
+            _record_finish(None)
+            if self.deadline:
+                chunks = _read_within(chunks, time.monotonic() + self.deadline)
+            finished = False
+            try:
+                for chunk in chunks:
+                    if chunk is _DEADLINE:
+                        if not finished:
+                            _record_finish("deadline")
+                            yield self._deadline_chunk()
+                        return
+                    if (chunk.generation_info or {}).get("finish_reason"):
+                        _record_finish(chunk.generation_info["finish_reason"])
+                        finished = True
+                    yield chunk
+            finally:
+                chunks.close()
+
+        async def _afinish(self, chunks):
+            """Async variant of _finish"""
+            _record_finish(None)
+            ends = time.monotonic() + self.deadline if self.deadline else None
+            finished = False
+            try:
+                while True:
+                    try:
+                        if ends is None:
+                            chunk = await chunks.__anext__()
+                        else:
+                            chunk = await asyncio.wait_for(chunks.__anext__(), max(ends - time.monotonic(), 0))
+                    except StopAsyncIteration:
+                        return
+                    except asyncio.TimeoutError:
+                        if not finished:
+                            _record_finish("deadline")
+                            yield self._deadline_chunk()
+                        return
+                    if (chunk.generation_info or {}).get("finish_reason"):
+                        _record_finish(chunk.generation_info["finish_reason"])
+                        finished = True
+                    yield chunk
+            finally:
+                await chunks.aclose()
+
+        def _fallback_params(self, params: Dict[str, Any], error: Exception) -> Dict[str, Any]:
+            """Params for the fallback request, or re-raise when there is no fallback"""
+            if not self.fallback_model or self.fallback_model == self.model_name:
+                raise error
+            get_shared_client().record_fallback(self.model_name, self.fallback_model, error)
+            return {**params, "model_name": self.fallback_model}
+
+        def _pool_params(self) -> Dict[str, Any]:
+            params = {"model_name": self.model_name, "temperature": self.temperature}
+            if self.max_tokens is not None:
+                params["max_tokens"] = self.max_tokens
+            if self.model_kwargs:
+                params["model_kwargs"] = self.model_kwargs
+            return params
+
+        def _deadline_key(self, client: SharedLLMClient, messages, stop, **kwargs) -> str:
+            return client.request_key({**self._pool_params(), "deadline": self.deadline}, messages, self._stop(stop),
+                                      **kwargs)
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            client = get_shared_client()
+            if self.deadline:
+                # Only a stream can be stopped part way, so a deadline turns the call into one;
+                # identical concurrent calls still share a single stream
+                from langchain_core.language_models.chat_models import generate_from_stream
+                result = client.coalesce(
+                    self._deadline_key(client, messages, stop, **kwargs),
+                    lambda: generate_from_stream(self._stream(messages, stop=stop, run_manager=run_manager, **kwargs)),
+                )
+                _record_finish((result.generations[0].generation_info or {}).get("finish_reason"))
+                return result
+            stop = self._stop(stop)
+
+            def generate(params):
+                return client.coalesced_call(
+                    client.request_key(params, messages, stop, **kwargs),
+                    params,
+                    lambda model: model._generate(messages, stop=stop, run_manager=run_manager, **kwargs),
+                )
+
+            params = self._pool_params()
+            try:
+                result = generate(params)
+            except Exception as e:
+                result = generate(self._fallback_params(params, e))
+            _record_finish((result.generations[0].generation_info or {}).get("finish_reason"))
+            return result
+
+        async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+            client = get_shared_client()
+            if self.deadline:
+                from langchain_core.language_models.chat_models import agenerate_from_stream
+                result = await client.acoalesce(
+                    self._deadline_key(client, messages, stop, **kwargs),
+                    lambda: agenerate_from_stream(self._astream(messages, stop=stop, run_manager=run_manager, **kwargs)),
+                )
+                _record_finish((result.generations[0].generation_info or {}).get("finish_reason"))
+                return result
+            stop = self._stop(stop)
+
+            async def generate(params):
+                return await client.coalesced_acall(
+                    client.request_key(params, messages, stop, **kwargs),
+                    params,
+                    lambda model: model._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs),
+                )
+
+            params = self._pool_params()
+            try:
+                result = await generate(params)
+            except Exception as e:
+                result = await generate(self._fallback_params(params, e))
+            _record_finish((result.generations[0].generation_info or {}).get("finish_reason"))
+            return result
+
+        def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+            yield from self._finish(self._pooled_stream(messages, self._stop(stop), run_manager, **kwargs))
+
+        def _pooled_stream(self, messages, stop=None, run_manager=None, **kwargs):
+            client = get_shared_client()
+            params = self._pool_params()
+            started = False
+            try:
+                for chunk in client.stream(
+                    params, lambda model: model._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+                ):
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                # Text already handed out cannot be taken back, so only a failure before it falls back
+                if started:
+                    raise
+                params = self._fallback_params(params, e)
+            yield from client.stream(
+                params, lambda model: model._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+            )
+
+        async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+            async for chunk in self._afinish(self._apooled_stream(messages, self._stop(stop), run_manager, **kwargs)):
+                yield chunk
+
+        async def _apooled_stream(self, messages, stop=None, run_manager=None, **kwargs):
+            client = get_shared_client()
+            params = self._pool_params()
+            started = False
+            try:
+                async for chunk in client.astream(
+                    params, lambda model: model._astream(messages, stop=stop, run_manager=run_manager, **kwargs)
+                ):
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                if started:
+                    raise
+                params = self._fallback_params(params, e)
+            async for chunk in client.astream(
+                params, lambda model: model._astream(messages, stop=stop, run_manager=run_manager, **kwargs)
+            ):
+                yield chunk
+
+    return PooledChatOpenAI
+
+
+def __getattr__(name: str) -> Any:
+    # PooledChatOpenAI subclasses ChatOpenAI, so it is defined when first requested
+    if name == "PooledChatOpenAI":
+        with _shared_lock:
+            if name not in globals():
+                globals()[name] = _define_pooled_chat_openai()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,304 @@
+"""
+Prometheus-style metrics
+Counters, histograms and callback gauges rendered in the Prometheus text format
+and served over a local HTTP endpoint. Enabled by METRICS_PORT; when it is unset
+every metric is a shared no-op, so instrumented code pays one method call
+
+Usage:
+    METRICS_PORT=9464 python fintech_adk.py --companies-file companies.txt
+    curl localhost:9464/metrics
+"""
+
+import os
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: Tuple[str, str] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """Base for labelled metrics; labels() returns the child for one label set"""
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], "_Metric"] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values, **kwargs) -> "_Metric":
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._child())
+        return child
+
+    def _child(self):
+        raise NotImplementedError
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def drain(self) -> Dict[Tuple[str, ...], Any]:
+        """Values per label set since the last drain, resetting them to zero"""
+        return {}
+
+    def merge(self, values: Dict[Tuple[str, ...], Any]):
+        """Add values drained from the same metric in another process"""
+
+    @property
+    def exposed_name(self) -> str:
+        return self.name
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.exposed_name} {self.documentation}", f"# TYPE {self.exposed_name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class _CounterValue:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def take(self) -> float:
+        with self._lock:
+            value, self.value = self.value, 0.0
+        return value
+
+
+class Counter(_Metric):
+    """Monotonic count"""
+    kind = "counter"
+
+    def _child(self):
+        return _CounterValue()
+
+    @property
+    def exposed_name(self) -> str:
+        return f"{self.name}_total"
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def drain(self) -> Dict[Tuple[str, ...], float]:
+        return {key: child.take() for key, child in list(self._children.items())}
+
+    def merge(self, values: Dict[Tuple[str, ...], float]):
+        for key, value in values.items():
+            self.labels(*key).inc(value)
+
+    def _samples(self) -> List[str]:
+        return [f"{self.exposed_name}{_label_text(self.labelnames, key)} {child.value}"
+                for key, child in sorted(self._children.items())]
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            if index < len(self.counts):
+                self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def take(self) -> Tuple[List[int], float, int]:
+        with self._lock:
+            taken = (self.counts, self.sum, self.count)
+            self.counts, self.sum, self.count = [0] * len(self.buckets), 0.0, 0
+        return taken
+
+    def add(self, counts: List[int], total: float, count: int):
+        with self._lock:
+            self.counts = [mine + theirs for mine, theirs in zip(self.counts, counts)]
+            self.sum += total
+            self.count += count
+
+
+class Histogram(_Metric):
+    """Distribution over fixed buckets"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def drain(self) -> Dict[Tuple[str, ...], Tuple[List[int], float, int]]:
+        return {key: child.take() for key, child in list(self._children.items())}
+
+    def merge(self, values: Dict[Tuple[str, ...], Tuple[List[int], float, int]]):
+        for key, (counts, total, count) in values.items():
+            self.labels(*key).add(counts, total, count)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, child in sorted(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, child.counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, key, ('le', repr(bound)))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_label_text(self.labelnames, key, ('le', '+Inf'))} {child.count}")
+            lines.append(f"{self.name}_sum{_label_text(self.labelnames, key)} {child.sum}")
+            lines.append(f"{self.name}_count{_label_text(self.labelnames, key)} {child.count}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Value read from a callback at scrape time: {label values: value}"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 callback: Callable[[], Dict[Tuple[str, ...], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def _samples(self) -> List[str]:
+        try:
+            values = self.callback() if self.callback else {}
+        except Exception as e:
+            logger.warning(f"Gauge {self.name} callback failed: {e}")
+            values = {}
+        return [f"{self.name}{_label_text(self.labelnames, key)} {value}" for key, value in sorted(values.items())]
+
+
+class _NoopMetric:
+    """Stand-in for every metric type while metrics are off"""
+    __slots__ = ()
+
+    def labels(self, *values, **kwargs):
+        return self
+
+    def inc(self, amount: float = 1.0):
+        pass
+
+    def observe(self, value: float):
+        pass
+
+
+NOOP_METRIC = _NoopMetric()
+
+
+class Registry:
+    """Named metrics and their text exposition"""
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric):
+        if not self.enabled:
+            return NOOP_METRIC
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              callback: Callable[[], Dict[Tuple[str, ...], float]] = None):
+        return self._register(Gauge(name, documentation, labelnames, callback))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+    def drain(self) -> Dict[str, Dict[Tuple[str, ...], Any]]:
+        """Counter and histogram values since the last drain, reset to zero
+
+        Worker processes send these back with each result so the parent's endpoint
+        covers their work; gauges are read live and are not drained
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        drained = {metric.name: metric.drain() for metric in metrics}
+        return {name: values for name, values in drained.items() if values}
+
+    def merge(self, drained: Dict[str, Dict[Tuple[str, ...], Any]]):
+        """Add values drained in another process to the metrics of the same name"""
+        with self._lock:
+            metrics = dict(self._metrics)
+        for name, values in drained.items():
+            if name in metrics:
+                metrics[name].merge(values)
+
+
+registry = Registry(enabled=bool(os.getenv("METRICS_PORT")))
+
+_server = None
+
+
+def start_metrics_server(port: int = None, host: str = "127.0.0.1"):
+    """Serve /metrics on a daemon thread; a no-op when metrics are disabled or already served"""
+    global _server
+    if not registry.enabled or _server is not None:
+        return _server
+    port = port if port is not None else int(os.getenv("METRICS_PORT"))
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    _server = ThreadingHTTPServer((host, port), Handler)
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, daemon=True).start()
+    logger.info(f"Serving metrics on http://{host}:{_server.server_address[1]}/metrics")
+    return _server
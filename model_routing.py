@@ -0,0 +1,192 @@
+"""
+Per-role model routing
+Each agent role gets a route: model, temperature, generation limits (max tokens,
+stop sequences, a deadline) and a fallback model tried when a request fails.
+Short deterministic stages run cold and capped; the validator re-asks a larger
+model only when its first review reports a problem. Routes are overridden per role
+from a JSON file named by MODEL_ROUTES_PATH; GENERATION_LIMITS=0 drops the limits
+
+Usage:
+    MODEL_ROUTES_PATH=routes.json python fintech_adk.py "Tesla Inc"
+    # routes.json: {"Report Compiler": {"model": "gemma3:4b", "max_tokens": 3000, "deadline": 90}}
+"""
+
+import os
+import json
+import logging
+import statistics
+from dataclasses import dataclass, asdict, replace
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "gemma3:1b"
+LARGE_MODEL = "gemma3:4b"
+
+# Relative compute per 1k generated tokens, roughly parameter count. Local models cost
+# no money, so a run's cost is compared in these units with running all of it on DEFAULT_MODEL
+MODEL_COST = {"gemma3:1b": 1.0, "gemma3:4b": 4.0, "gemma3:12b": 12.0, "gemma3:27b": 27.0}
+
+# Both prompts label the task "Current Task:"; a model writing such a heading has
+# finished its answer and started echoing the prompt
+PROMPT_ECHO_STOPS = ("\nCurrent Task:", "\nPrevious Context:")
+
+# Limits off (GENERATION_LIMITS=0) records uncapped runs, the reference for savings
+GENERATION_LIMITS = os.getenv("GENERATION_LIMITS", "1") != "0"
+
+# Finish reasons of a generation that a limit cut short
+CAPPED = ("length", "deadline")
+
+
+@dataclass(frozen=True)
+class Route:
+    """How one agent role calls the LLM"""
+    model: str = DEFAULT_MODEL
+    temperature: float = 0.7
+    max_tokens: Optional[int] = None
+    stop: Tuple[str, ...] = PROMPT_ECHO_STOPS
+    # Seconds from sending the request; the text generated by then is kept
+    deadline: Optional[float] = None
+    # Model tried once when a request to model fails
+    fallback: Optional[str] = None
+    # Larger model re-asked when the agent's answer reports a problem
+    escalate_to: Optional[str] = None
+
+    def escalated(self) -> "Route":
+        """Route of the escalated call: the larger model, falling back to this one"""
+        return replace(self, model=self.escalate_to, fallback=self.model, escalate_to=None)
+
+    def uncapped(self) -> "Route":
+        return replace(self, max_tokens=None, stop=(), deadline=None)
+
+    def limits(self) -> Optional[Dict[str, Any]]:
+        """Generation limits in effect, None when the route is uncapped"""
+        if self.max_tokens is None and not self.stop and self.deadline is None:
+            return None
+        return {"max_tokens": self.max_tokens, "stop": list(self.stop), "deadline": self.deadline}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+# Deadlines leave room for max_tokens at a slow local decode rate (~20 tokens/s); they
+# stop a stalled or looping generation rather than shorten a normal one
+DEFAULT_ROUTES = {
+    "Company Researcher": Route(temperature=0.5, max_tokens=1024, deadline=60),
+    "Market Analyst": Route(temperature=0.7, max_tokens=1024, deadline=60),
+    # Interprets figures that are already computed: deterministic and short
+    "Financial Calculator": Route(temperature=0.1, max_tokens=512, deadline=30),
+    "Risk Assessor": Route(temperature=0.5, max_tokens=1024, deadline=60),
+    "Report Compiler": Route(temperature=0.4, max_tokens=2048, deadline=120),
+    "Fact Checker & Validator": Route(temperature=0.1, max_tokens=512, deadline=30, escalate_to=LARGE_MODEL),
+    "Quality Validator": Route(temperature=0.1, max_tokens=512, deadline=30, escalate_to=LARGE_MODEL),
+}
+
+
+def load_routes(path: str = None) -> Dict[str, Route]:
+    """Default routes, with the fields given per role in a JSON file replaced"""
+    routes = dict(DEFAULT_ROUTES)
+    if not path:
+        return routes
+    with open(path, encoding="utf-8") as f:
+        overrides = json.load(f)
+    for role, fields in overrides.items():
+        if "stop" in fields:
+            fields = {**fields, "stop": tuple(fields["stop"])}
+        route = replace(routes.get(role, Route()), **fields)
+        # A role moved off the default model falls back to it unless told otherwise
+        if "fallback" not in fields and route.model != DEFAULT_MODEL:
+            route = replace(route, fallback=DEFAULT_MODEL)
+        routes[role] = route
+    logger.info(f"Model routes loaded from {path}: {sorted(overrides)}")
+    return routes
+
+
+routes = load_routes(os.getenv("MODEL_ROUTES_PATH"))
+
+
+def route_for(role: str) -> Route:
+    """Route of an agent role; roles without one use the default model"""
+    route = routes.get(role, Route())
+    return route if GENERATION_LIMITS else route.uncapped()
+
+
+def estimate_cost(model: str, tokens: int) -> float:
+    return tokens / 1000 * MODEL_COST.get(model, MODEL_COST[DEFAULT_MODEL])
+
+
+def summarize_routing(decisions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Calls, seconds, tokens and cost per model for one run's routed calls
+
+    Each decision has role, model, reason ("route" or "escalated"), seconds and tokens.
+    Cost is compared with generating the same tokens on DEFAULT_MODEL
+    """
+    models: Dict[str, Dict[str, Any]] = {}
+    for decision in decisions:
+        entry = models.setdefault(decision["model"], {"calls": 0, "seconds": 0.0, "tokens": 0, "cost_units": 0.0})
+        entry["calls"] += 1
+        entry["seconds"] += decision["seconds"]
+        entry["tokens"] += decision["tokens"]
+        entry["cost_units"] += estimate_cost(decision["model"], decision["tokens"])
+
+    escalated = [decision for decision in decisions if decision["reason"] == "escalated"]
+    cost = sum(entry["cost_units"] for entry in models.values())
+    baseline = sum(estimate_cost(DEFAULT_MODEL, decision["tokens"]) for decision in decisions)
+    return {
+        "models": models,
+        "escalations": [decision["role"] for decision in escalated],
+        "escalation_seconds": sum(decision["seconds"] for decision in escalated),
+        "cost_units": cost,
+        "baseline_cost_units": baseline,
+        "extra_cost_units": cost - baseline,
+    }
+
+
+def reference_tokens(records: Iterable[Dict[str, Any]]) -> Dict[str, float]:
+    """Median output tokens per agent over uncapped runs (execution journal records)
+
+    Only records without limits count: a capped answer says nothing about how long
+    the uncapped one would have been
+    """
+    lengths: Dict[str, List[int]] = {}
+    for record in records:
+        tokens = record.get("output_tokens")
+        if record.get("limits") is None and not record.get("errors") and tokens:
+            lengths.setdefault(record["agent"], []).append(tokens)
+    return {agent: statistics.median(values) for agent, values in lengths.items()}
+
+
+def summarize_limits(calls: List[Dict[str, Any]], references: Dict[str, float]) -> Dict[str, Any]:
+    """Per-stage finish reason and the tokens and seconds the limits saved
+
+    Each call has stage, role, finish_reason, tokens and seconds. Savings are the
+    role's uncapped reference length minus the tokens generated, at the call's own
+    decode rate; they are None for roles without a reference
+    """
+    stages = {}
+    for call in calls:
+        reference = references.get(call["role"])
+        saved = max(0.0, reference - call["tokens"]) if reference is not None else None
+        rate = call["tokens"] / call["seconds"] if call["seconds"] > 0 else None
+        # A stage regenerated after a failed check is listed again under a numbered name
+        name, attempt = call["stage"], 1
+        while name in stages:
+            attempt += 1
+            name = f"{call['stage']} #{attempt}"
+        stages[name] = {
+            "role": call["role"],
+            "finish_reason": call["finish_reason"],
+            "capped": call["finish_reason"] in CAPPED,
+            "tokens": call["tokens"],
+            "seconds": call["seconds"],
+            "reference_tokens": reference,
+            "tokens_saved": saved,
+            "seconds_saved": saved / rate if saved is not None and rate else None,
+        }
+    return {
+        "enabled": GENERATION_LIMITS,
+        "stages": stages,
+        "capped_stages": [stage for stage, entry in stages.items() if entry["capped"]],
+        "tokens_saved": sum(entry["tokens_saved"] or 0 for entry in stages.values()),
+        "seconds_saved": sum(entry["seconds_saved"] or 0 for entry in stages.values()),
+    }
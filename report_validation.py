@@ -0,0 +1,211 @@
+"""
+Rule-based checks of investment reports
+Checks sections, recommendation and figures against the computed metrics so the
+LLM validator only runs when a report fails or the rules cannot decide
+"""
+
+import re
+import json
+import threading
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from structured_output import InvestmentReport
+
+REQUIRED_SECTIONS = list(InvestmentReport.model_fields)
+SECTION_ALIASES = {"investment_recommendation": "recommendation", "summary": "executive_summary",
+                   "overview": "company_overview", "risk_analysis": "risk_assessment"}
+RECOMMENDATIONS = ["Buy", "Hold", "Sell"]
+
+# Labels the report uses for each parsed_data metric; the first number after the label is compared
+METRIC_PATTERNS = {
+    "pe_ratio": r"(?:p/?e|price[- ]to[- ]earnings)(?:[ _]ratio)?",
+    "revenue_growth": r"revenue[ _]growth(?:[ _]rate)?",
+    "profit_margin": r"(?:net[ _])?profit[ _]margin",
+}
+# The gap after a label stops at another figure or a percentage, and a year is not a value
+NUMBER = r"[^0-9\n%-]{0,25}?(?!(?:19|20)\d\d\b(?!\.\d))(-?\d+(?:,\d{3})*(?:\.\d+)?)"
+PERCENT_METRICS = ("revenue_growth", "profit_margin")
+PERCENT = re.compile(r"\s*(?:%|per ?cent)", re.IGNORECASE)
+# Relative tolerance, with an absolute floor for small values such as growth percentages
+RELATIVE_TOLERANCE = 0.05
+ABSOLUTE_TOLERANCE = 0.5
+
+
+@dataclass
+class ValidationResult:
+    """Outcome of the rule checks: pass, fail or inconclusive"""
+    status: str
+    format: str
+    missing_sections: List[str] = field(default_factory=list)
+    mismatched_metrics: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    checked_metrics: List[str] = field(default_factory=list)
+    recommendation: Optional[str] = None
+    issues: List[str] = field(default_factory=list)
+
+    @property
+    def passed(self) -> bool:
+        return self.status == "pass"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"method": "rules", **asdict(self)}
+
+
+def _section_key(title: str) -> str:
+    key = "_".join(re.sub(r"[^a-z0-9 ]", " ", title.lower()).split())
+    return SECTION_ALIASES.get(key, key)
+
+
+def parse_report(report: Any) -> Tuple[str, Dict[str, str]]:
+    """Split a report into sections: a dict or JSON object if present, else Markdown headings"""
+    if isinstance(report, dict):
+        return "json", {_section_key(key): value if isinstance(value, str) else json.dumps(value)
+                        for key, value in report.items()}
+    text = str(report or "")
+    start, end = text.find("{"), text.rfind("}")
+    if start != -1 and end > start:
+        try:
+            data = json.loads(text[start:end + 1])
+            if isinstance(data, dict):
+                return "json", {_section_key(key): value if isinstance(value, str) else json.dumps(value)
+                                for key, value in data.items()}
+        except json.JSONDecodeError:
+            pass
+
+    sections: Dict[str, str] = {}
+    current = None
+    for line in text.splitlines():
+        heading = re.match(r"^\s*#{1,6}\s+(.+?)\s*#*\s*$", line)
+        if heading:
+            current = _section_key(heading.group(1))
+            sections.setdefault(current, "")
+        elif current is not None:
+            sections[current] += line + "\n"
+    return "markdown", sections
+
+
+def _to_float(value: str) -> float:
+    return float(value.replace(",", ""))
+
+
+def _check_recommendation(result: ValidationResult, text: str, inconclusive: List[str]):
+    # A single Buy/Hold/Sell in the recommendation section; several is ambiguous
+    pattern = r"\b(" + "|".join(RECOMMENDATIONS) + r")\b"
+    found = {word.capitalize() for word in re.findall(pattern, text, re.IGNORECASE)}
+    if len(found) == 1:
+        result.recommendation = found.pop()
+    elif found:
+        inconclusive.append(f"Ambiguous recommendation: {', '.join(sorted(found))}")
+    else:
+        result.issues.append("Recommendation is not one of Buy/Hold/Sell")
+
+
+def _reference(reference_metrics: Dict[str, Any] = None) -> Dict[str, float]:
+    return {name: value for name, value in (reference_metrics or {}).items()
+            if name in METRIC_PATTERNS and isinstance(value, (int, float))}
+
+
+def _check_figures(result: ValidationResult, body: str, reference: Dict[str, float]):
+    # Figures quoted in the report must match the computed metrics
+    for name, expected in reference.items():
+        # Word boundaries keep "pe" inside words such as "expected" or "operates" from matching
+        for match in re.finditer(rf"\b(?:{METRIC_PATTERNS[name]})\b" + NUMBER, body, re.IGNORECASE):
+            # A P/E quoted as a percentage is some other figure
+            if name not in PERCENT_METRICS and PERCENT.match(body, match.end()):
+                continue
+            if name not in result.checked_metrics:
+                result.checked_metrics.append(name)
+            actual = _to_float(match.group(1))
+            if abs(actual - expected) > max(ABSOLUTE_TOLERANCE, abs(expected) * RELATIVE_TOLERANCE):
+                result.mismatched_metrics[name] = {"expected": expected, "reported": actual}
+                result.issues.append(f"{name} reported as {actual}, computed {expected}")
+                break
+
+
+def _conclude(result: ValidationResult, inconclusive: List[str]):
+    if result.issues:
+        result.status = "fail"
+    elif inconclusive:
+        result.status = "inconclusive"
+        result.issues.extend(inconclusive)
+
+
+def validate_report(report: str, reference_metrics: Dict[str, Any] = None) -> ValidationResult:
+    """Check a report's structure, recommendation and figures against reference metrics"""
+    report_format, sections = parse_report(report)
+    result = ValidationResult(status="pass", format=report_format)
+
+    result.missing_sections = [name for name in REQUIRED_SECTIONS if not str(sections.get(name, "")).strip()]
+    if result.missing_sections:
+        result.issues.append(f"Missing sections: {', '.join(result.missing_sections)}")
+
+    inconclusive = []
+    _check_recommendation(result, str(sections.get("recommendation", "")), inconclusive)
+
+    reference = _reference(reference_metrics)
+    if not reference:
+        inconclusive.append("No computed metrics to check figures against")
+    body = "\n".join(str(value) for value in sections.values()) or str(report)
+    _check_figures(result, body, reference)
+    if reference and not result.checked_metrics:
+        inconclusive.append("Report quotes none of the computed metrics")
+
+    _conclude(result, inconclusive)
+    _record(result)
+    return result
+
+
+def validate_sections(sections: Dict[str, Any], reference_metrics: Dict[str, Any] = None) -> ValidationResult:
+    """Check report sections as they are written, before the whole report exists
+
+    Each section must be non-empty, a recommendation section must name one of
+    Buy/Hold/Sell, and figures it quotes must match the computed metrics. A section
+    that quotes no figures is not inconclusive: they may belong to another section.
+    Not counted in validation_stats, which tracks whole-report checks
+    """
+    result = ValidationResult(status="pass", format="sections")
+    sections = {_section_key(name): value if isinstance(value, str) else json.dumps(value)
+                for name, value in sections.items()}
+
+    result.missing_sections = [name for name, text in sections.items() if not str(text or "").strip()]
+    if result.missing_sections:
+        result.issues.append(f"Empty sections: {', '.join(result.missing_sections)}")
+
+    inconclusive = []
+    if "recommendation" in sections:
+        _check_recommendation(result, str(sections["recommendation"] or ""), inconclusive)
+    _check_figures(result, "\n".join(str(text or "") for text in sections.values()), _reference(reference_metrics))
+
+    _conclude(result, inconclusive)
+    return result
+
+
+# The verdict line the validator prompts ask for ("VERDICT: PASS" / "VERDICT: FAIL")
+VERDICT = r"^\W*verdict\W{0,6}(pass|fail)\b"
+
+
+def review_verdict(review: Any) -> str:
+    """pass or fail from the last verdict line of an LLM review; inconclusive without one"""
+    verdicts = re.findall(VERDICT, str(review or ""), re.IGNORECASE | re.MULTILINE)
+    return verdicts[-1].lower() if verdicts else "inconclusive"
+
+
+def reports_problem(review: Any) -> bool:
+    """Whether an LLM review fails the report or gives no verdict"""
+    return review_verdict(review) != "pass"
+
+
+_lock = threading.Lock()
+_stats = {"rule_validations": 0, "llm_validations_skipped": 0, "llm_validations_run": 0}
+
+
+def _record(result: ValidationResult):
+    with _lock:
+        _stats["rule_validations"] += 1
+        _stats["llm_validations_skipped" if result.passed else "llm_validations_run"] += 1
+
+
+def validation_stats() -> Dict[str, int]:
+    """Process-wide counts of rule checks and the LLM validations they avoided"""
+    with _lock:
+        return dict(_stats)
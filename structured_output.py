@@ -0,0 +1,147 @@
+"""
+Structured (JSON) agent output
+Report schema, schema prompt instructions and an incremental parser that hands
+out each top-level field of a streamed JSON object as soon as it is complete
+"""
+
+import json
+import logging
+from typing import Any, Dict, List, Tuple, Type
+
+from pydantic import BaseModel, Field, ValidationError
+
+logger = logging.getLogger(__name__)
+
+# OpenAI-compatible JSON mode; Ollama maps it to format="json"
+JSON_MODE = {"response_format": {"type": "json_object"}}
+
+
+class InvestmentReport(BaseModel):
+    """The six sections of an investment report"""
+    executive_summary: str = Field(description="Brief overview of findings")
+    company_overview: str = Field(description="Company background, products, business model")
+    market_analysis: str = Field(description="Industry trends, competitive landscape, market position")
+    financial_analysis: str = Field(description="Financial metrics, performance indicators, financial health")
+    risk_assessment: str = Field(description="Identified risks and mitigation strategies")
+    recommendation: str = Field(description="Buy, Hold or Sell, followed by the reasoning")
+
+
+class ReportSummary(BaseModel):
+    """The sections written last in pipelined mode, from the four body sections"""
+    executive_summary: str = InvestmentReport.model_fields["executive_summary"]
+    recommendation: str = InvestmentReport.model_fields["recommendation"]
+
+
+def schema_instructions(schema: Type[BaseModel], fields: List[str] = None) -> str:
+    """Prompt text describing the JSON object to return"""
+    fields = fields or list(schema.model_fields)
+    lines = [f'- "{name}": {schema.model_fields[name].description}' for name in fields]
+    return ("Respond with a single JSON object and nothing else. Use exactly these string fields:\n"
+            + "\n".join(lines))
+
+
+def validate_fields(schema: Type[BaseModel], data: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+    """Keep the fields that pass the schema and list the ones still missing or invalid"""
+    valid = {}
+    for name, info in schema.model_fields.items():
+        value = data.get(name)
+        if isinstance(value, (dict, list)):
+            value = json.dumps(value)
+        if isinstance(value, str) and value.strip():
+            valid[name] = value.strip()
+
+    missing = [name for name in schema.model_fields if name not in valid]
+    if not missing:
+        try:
+            valid = schema(**valid).model_dump()
+        except ValidationError as e:
+            missing = sorted({str(error["loc"][0]) for error in e.errors()})
+            valid = {name: value for name, value in valid.items() if name not in missing}
+    return valid, missing
+
+
+class IncrementalJSONParser:
+    """Feed text chunks of one JSON object; each completed top-level field is returned once"""
+
+    def __init__(self):
+        self.buffer = ""
+        self.fields: Dict[str, Any] = {}
+        self.done = False
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expect = "start"
+        self._key = None
+        self._start = 0
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Consume a chunk and return the (key, value) pairs it completed"""
+        self.buffer += chunk
+        completed = []
+        text = self.buffer
+        while self._pos < len(text) and not self.done:
+            char = text[self._pos]
+            position = self._pos
+            self._pos += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._expect == "key_string":
+                        self._key = json.loads(text[self._start:position + 1])
+                        self._expect = "colon"
+                    elif self._depth == 1 and self._expect == "string":
+                        self._emit(completed, text[self._start:position + 1])
+                continue
+
+            if self._expect == "start":
+                # Anything before the opening brace (code fences, prose) is ignored
+                if char == "{":
+                    self._depth = 1
+                    self._expect = "key"
+                continue
+
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._expect in ("key", "value"):
+                    self._start = position
+                    self._expect = "key_string" if self._expect == "key" else "string"
+            elif char in "{[":
+                if self._depth == 1 and self._expect == "value":
+                    self._start = position
+                    self._expect = "nested"
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 1 and self._expect == "scalar":
+                    self._emit(completed, text[self._start:position])
+                self._depth -= 1
+                if self._depth == 1 and self._expect == "nested":
+                    self._emit(completed, text[self._start:position + 1])
+                elif self._depth == 0:
+                    self.done = True
+            elif self._depth == 1:
+                if char == ":" and self._expect == "colon":
+                    self._expect = "value"
+                elif char == ",":
+                    if self._expect == "scalar":
+                        self._emit(completed, text[self._start:position])
+                    self._expect = "key"
+                elif not char.isspace() and self._expect == "value":
+                    self._start = position
+                    self._expect = "scalar"
+        return completed
+
+    def _emit(self, completed: List[Tuple[str, Any]], raw: str):
+        self._expect = "comma"
+        try:
+            value = json.loads(raw.strip())
+        except json.JSONDecodeError:
+            logger.warning(f"Discarding unparseable JSON field {self._key!r}")
+            return
+        self.fields[self._key] = value
+        completed.append((self._key, value))
@@ -0,0 +1,215 @@
+import json
+import time
+import socket
+import asyncio
+
+import pytest
+
+from fake_llm_server import FakeLLMServer
+
+FUNDAMENTALS = """ticker,company_name,price,eps,revenue,revenue_prior,net_income,shares_outstanding
+AAA,Alpha Corp,284,10,108.1e9,100e9,27.35e9,1e9
+BBB,Beta Corp,50,2,20e9,25e9,1e9,5e8
+"""
+
+
+@pytest.fixture(scope="module")
+def adk(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp("adk")
+    (workdir / "fundamentals.csv").write_text(FUNDAMENTALS)
+    server = FakeLLMServer(latency=0.0, tokens_per_second=5000).start()
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(workdir)
+        patch.setenv("OLLAMA_BASE_URL", server.base_url)
+        patch.setenv("MEMORY_BACKEND", "dict")
+        patch.setenv("FUNDAMENTALS_PATH", str(workdir / "fundamentals.csv"))
+        patch.setenv("FUNDAMENTALS_STORE", "none")
+        for name in ("LLM_CACHE_PATH", "FINGERPRINTS_PATH", "TRACE_PATH", "STAGE_TIMEOUT"):
+            patch.delenv(name, raising=False)
+        import fintech_adk
+        yield fintech_adk, server
+    server.stop()
+
+
+def test_back_to_back_runs_do_not_share_checkpoints(adk):
+    fintech_adk, server = adk
+
+    first = fintech_adk.create_financial_analysis_adk("Alpha Corp")
+    server.reset()
+    second = fintech_adk.create_financial_analysis_adk("Beta Corp")
+
+    assert first["status"] == second["status"] == "complete"
+    assert second["company_name"] == "Beta Corp"
+    assert second["run_id"] != first["run_id"]
+    assert second["schedule"]["skipped_stages"] == []
+    # Every agent stage of the second company actually reached the model
+    assert len(server.stats()) >= 5
+    assert {log["stage"] for log in second["execution_logs"]} >= {"financial_calculation", "report_compilation"}
+
+
+
+@pytest.fixture
+def slow_llm(monkeypatch):
+    """Serve the shared client from a server taking 0.5s per answer, 4 at a time"""
+    import llm_client
+    server = FakeLLMServer(latency=0.5, tokens_per_second=5000, parallel=4).start()
+    monkeypatch.setenv("OLLAMA_BASE_URL", server.base_url)
+    monkeypatch.setattr(llm_client, "_shared_client", None)
+    yield server
+    server.stop()
+    llm_client._shared_client = None
+
+
+def test_gather_execute_waits_on_the_calls_together(adk, slow_llm):
+    fintech_adk, _ = adk
+    store = fintech_adk.MemoryStore()
+    pairs = [(fintech_adk.company_researcher, f"Describe the business of company {n}") for n in range(4)]
+
+    started = time.monotonic()
+    results = asyncio.run(fintech_adk._closing_loop_pool(fintech_adk.gather_execute(pairs, store=store)))
+
+    # One after the other they would take 2s
+    assert time.monotonic() - started < 1.5
+    assert len(slow_llm.records) == 4
+    assert not any(isinstance(result, fintech_adk.AgentError) for result in results)
+
+
+def test_stage_timeout_fails_the_call_without_waiting_for_it(adk, slow_llm):
+    fintech_adk, _ = adk
+    store = fintech_adk.MemoryStore()
+    slow_llm.latency = 3.0
+
+    started = time.monotonic()
+    result, other = fintech_adk.parallel_execute(fintech_adk.company_researcher, "Describe company T1",
+                                                 fintech_adk.market_analyst, "Describe market T2",
+                                                 store=store, timeout=0.3)
+
+    assert time.monotonic() - started < 1.5
+    assert isinstance(result, fintech_adk.AgentError) and isinstance(other, fintech_adk.AgentError)
+    assert result == "Error: Timed out after 0.3s"
+    assert [log.errors for log in store.get_logs()] == [["Timed out after 0.3s"]] * 2
+
+@pytest.fixture
+def unreachable_llm(monkeypatch):
+    """Point the shared client at a closed port; undone (with the client) after the test"""
+    import llm_client
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        dead_port = sock.getsockname()[1]
+    monkeypatch.setenv("OLLAMA_BASE_URL", f"http://127.0.0.1:{dead_port}/v1")
+    monkeypatch.setenv("LLM_MAX_RETRIES", "0")
+    monkeypatch.setattr(llm_client, "_shared_client", None)
+    return monkeypatch
+
+
+def test_batch_does_not_count_incomplete_runs(adk, unreachable_llm, tmp_path):
+    fintech_adk, _ = adk
+
+    results = fintech_adk.run_batch(["Alpha Corp"], output_dir=str(tmp_path))
+
+    assert results == {}
+    with open(tmp_path / "batch_manifest.jsonl", encoding="utf-8") as f:
+        entry = json.loads(f.readline())
+    assert entry["status"] == "error"
+    assert entry["error"].startswith("Run incomplete")
+    with open(entry["output_file"], encoding="utf-8") as f:
+        assert json.load(f)["status"] == "incomplete"
+
+
+def test_resume_runs_only_the_failed_agent_stages(adk, unreachable_llm, tmp_path):
+    fintech_adk, server = adk
+    import llm_client
+    backend = fintech_adk.SQLiteBackend(str(tmp_path / "memory.db"))
+
+    failed = fintech_adk.create_financial_analysis_adk("Alpha Corp", fintech_adk.MemoryStore(backend=backend))
+    assert failed["status"] == "incomplete"
+
+    # The server is back
+    unreachable_llm.undo()
+    llm_client._shared_client = None
+    server.reset()
+    resumed = fintech_adk.resume(failed["run_id"], backend=backend)
+
+    assert resumed["status"] == "complete"
+    assert resumed["run_id"] == failed["run_id"]
+    # Only tool stages had finished, and they do not count as saved LLM work
+    assert resumed["schedule"]["skipped_stages"]
+    assert resumed["context_summary"]["resumed"]["stages_skipped"] == 0
+    assert len(server.stats()) >= 5
+
+    server.reset()
+    again = fintech_adk.resume(failed["run_id"], backend=backend)
+    agent_stages = [stage for stage in fintech_adk.build_workflow_stages() if stage.agent is not None]
+    assert again["context_summary"]["resumed"]["stages_skipped"] == len(agent_stages)
+    assert server.stats() == []
+
+
+def test_resume_needs_a_persistent_backend(adk, monkeypatch):
+    fintech_adk, _ = adk
+    with pytest.raises(ValueError, match="MEMORY_BACKEND=sqlite"):
+        fintech_adk.resume("some-run")
+
+
+def test_run_exports_stage_and_llm_spans_under_one_trace(adk, monkeypatch, tmp_path):
+    fintech_adk, _ = adk
+    from tracing import JSONFileExporter, read_spans, tracer
+    path = str(tmp_path / "traces.jsonl")
+    monkeypatch.setattr(tracer, "exporter", JSONFileExporter(path))
+
+    result = fintech_adk.create_financial_analysis_adk("Beta Corp")
+
+    assert result["status"] == "complete"
+    spans = read_spans(path)
+    by_id = {span["spanId"]: span for span in spans}
+    root, = [span for span in spans if span["name"] == "workflow.run"]
+    assert {span["traceId"] for span in spans} == {root["traceId"]}
+    stages = [span for span in spans if span["name"].startswith("stage ")]
+    assert stages and all(by_id[span["parentSpanId"]] is root for span in stages)
+    # Every LLM request hangs off a stage, directly or through its prompt and request spans
+    for span in spans:
+        if span["name"] == "llm.request":
+            while not span["name"].startswith("stage "):
+                span = by_id[span["parentSpanId"]]
+    assert any(span["name"] == "llm.request" for span in spans)
+
+
+def test_section_failing_its_check_is_regenerated_once_with_the_findings(adk):
+    fintech_adk, server = adk
+    from report_validation import ValidationResult
+    store = fintech_adk.MemoryStore()
+    store.store("company_name", "Alpha Corp")
+    checked = []
+
+    def postcheck(output, values):
+        checked.append(output)
+        if len(checked) == 1:
+            return ValidationResult(status="fail", format="text", issues=["missing section: company overview"])
+        return ValidationResult(status="pass", format="text")
+
+    stage = fintech_adk.Stage(name="section_company_overview", output="section_company_overview",
+                              inputs=["company_name"], agent=fintech_adk.section_writers["company_overview"],
+                              task="Write the company overview section for {company_name}", postcheck=postcheck)
+    server.reset()
+    schedule = asyncio.run(fintech_adk._closing_loop_pool(fintech_adk.run_workflow([stage], store)))
+
+    assert schedule["failed_stages"] == []
+    assert len(server.records) == 2 and len(checked) == 2
+    assert store.retrieve("section_company_overview_check")["retried"] is True
+    assert store.retrieve("section_company_overview") == checked[1]
+    retry_log = store.get_logs()[-1]
+    assert "Rule check findings on your previous answer: missing section: company overview" in retry_log.input_context
+
+
+def test_pipelined_run_checks_each_section_and_stitches_the_report(adk):
+    fintech_adk, _ = adk
+
+    result = fintech_adk.create_financial_analysis_adk("Alpha Corp", pipelined=True)
+
+    assert result["status"] == "complete"
+    pipelined = result["context_summary"]["pipelined_report"]
+    assert pipelined["enabled"] is True
+    section_stages = [stage.name for stage in fintech_adk.pipelined_report_stages() if stage.postcheck is not None]
+    assert set(pipelined["section_checks"]) == set(section_stages)
+    assert all(check is not None for check in pipelined["section_checks"].values())
+    assert "report_compilation" not in result["schedule"]["stage_timings"]
+    assert "report_assembly" in result["schedule"]["stage_timings"]
@@ -0,0 +1,25 @@
+import json
+
+from batch_manifest import BatchManifest
+
+
+def test_entries_are_appended_as_companies_finish(tmp_path):
+    manifest = BatchManifest(str(tmp_path / "out"))
+    manifest.record("Tesla", {"output_file": "out/tesla.json", "seconds": 1.5})
+    manifest.record("Apple", error=RuntimeError("model unavailable"))
+
+    with open(manifest.path, encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f]
+    assert [(entry["company_name"], entry["status"]) for entry in entries] == [("Tesla", "ok"), ("Apple", "error")]
+    assert entries[0]["seconds"] == 1.5
+    assert entries[1]["error"] == "model unavailable"
+    assert manifest.results == {"Tesla": "out/tesla.json"}
+
+
+def test_a_new_batch_appends_to_an_existing_manifest(tmp_path):
+    BatchManifest(str(tmp_path)).record("Tesla", {"output_file": "a"})
+    manifest = BatchManifest(str(tmp_path))
+    manifest.record("Apple", {"output_file": "b"})
+    with open(manifest.path, encoding="utf-8") as f:
+        assert len(f.readlines()) == 2
+    assert manifest.results == {"Apple": "b"}
@@ -0,0 +1,32 @@
+from fintech_adk import ContextAssembler
+
+
+def test_selected_keys_in_declared_order_with_values_serialized_once():
+    context = {"company_name": "Tesla Inc", "financial_data": {"pe_ratio": 28.4}, "research": None, "other": "x"}
+    text = ContextAssembler().assemble(context, ["financial_data", "company_name", "research"], budget=1000)
+    assert text == 'financial_data: {"pe_ratio": 28.4}\ncompany_name: Tesla Inc'
+    assert "\\" not in text
+
+
+def test_no_selected_entries_renders_none():
+    assert ContextAssembler().assemble({"a": None}, ["a", "b"], budget=100) == "None"
+
+
+def test_large_entries_share_the_budget_and_small_ones_stay_whole():
+    assembler = ContextAssembler()
+    context = {"company_name": "Tesla Inc", "research": "r" * 4000, "market_info": "m" * 4000}
+    text = assembler.assemble(context, None, budget=300)
+
+    assert "company_name: Tesla Inc\n" in text
+    assert text.count("[truncated") == 2
+    assert "r" * 590 in text and "r" * 600 not in text
+    # Keys and truncation markers are the only overhead on top of the budget
+    assert assembler.estimate_tokens(text) <= 300 + 30
+
+
+def test_oldest_entries_are_dropped_first_but_pinned_keys_stay():
+    assembler = ContextAssembler(min_entry_tokens=32)
+    # Stored first, so the oldest entry, yet never dropped
+    context = {"company_name": "Tesla Inc", "research": "old", "market_info": "newer", "risk": "newest"}
+    text = assembler.assemble(context, None, budget=64)
+    assert text == "company_name: Tesla Inc\nrisk: newest"
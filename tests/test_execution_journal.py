@@ -0,0 +1,37 @@
+import os
+
+from fintech_adk import DictBackend, ExecutionJournal, ExecutionLog, MemoryStore
+
+
+def make_log(n: int) -> ExecutionLog:
+    return ExecutionLog(timestamp=f"t{n}", agent="Company Researcher", task=f"task {n}",
+                        input_context="", output="x" * 100, execution_time=0.1)
+
+
+def test_journal_rotates_by_size_and_reads_oldest_first(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = ExecutionJournal(path, max_bytes=1000, backup_count=2)
+    for n in range(20):
+        journal.append(make_log(n))
+    journal.close()
+
+    assert os.path.exists(path + ".1") and os.path.exists(path + ".2")
+    assert not os.path.exists(path + ".3")
+    # A file rotates on the write that takes it past max_bytes
+    assert os.path.getsize(path) < 1000
+    assert all(os.path.getsize(path + suffix) >= 1000 for suffix in (".1", ".2"))
+    tasks = [int(record["task"].split()[1]) for record in journal.read()]
+    # The oldest records rotated out; the rest are complete and in order
+    assert tasks == list(range(tasks[0], 20)) and tasks[0] > 0
+
+
+def test_memory_keeps_recent_logs_and_journals_all_of_them(tmp_path):
+    journal = ExecutionJournal(str(tmp_path / "journal.jsonl"))
+    store = MemoryStore(max_logs=3, journal=journal, backend=DictBackend())
+    for n in range(5):
+        store.add_log(make_log(n))
+    journal.close()
+
+    assert [log.task for log in store.get_logs()] == ["task 2", "task 3", "task 4"]
+    assert [record["task"] for record in journal.read()] == [f"task {n}" for n in range(5)]
+    assert not hasattr(make_log(0), "__dict__")
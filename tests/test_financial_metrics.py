@@ -0,0 +1,93 @@
+import math
+
+import numpy as np
+import pytest
+
+from financial_metrics import MetricsEngine, compute_metrics, get_metrics_engine, health_labels, normalize_name
+
+FUNDAMENTALS = """ticker,company_name,price,eps,revenue,revenue_prior,net_income,shares_outstanding
+AAPL,Apple Inc.,190,6.5,383e9,394e9,97e9,15.5e9
+GRO,Growth Corp,30,2,120,100,12,100e6
+LOSS,Loss Making Ltd,10,-1,50,0,-5,1e6
+GAP,Gap Holdings,,,,,,
+"""
+
+
+@pytest.fixture
+def engine(tmp_path):
+    path = tmp_path / "fundamentals.csv"
+    path.write_text(FUNDAMENTALS)
+    return MetricsEngine(str(path))
+
+
+def test_normalize_name_drops_punctuation_and_legal_suffixes():
+    assert normalize_name("Apple Inc.") == "apple"
+    assert normalize_name("  Growth   Corp ") == "growth"
+    assert normalize_name("AAPL") == "aapl"
+
+
+def test_compute_metrics_vectorized_columns(engine):
+    metrics = engine.metrics
+    row = engine.find("Growth Corp")
+    assert metrics["pe_ratio"][row] == pytest.approx(15.0)
+    assert metrics["revenue_growth"][row] == pytest.approx(20.0)
+    assert metrics["profit_margin"][row] == pytest.approx(10.0)
+    assert metrics["market_cap"][row] == pytest.approx(3e9)
+    assert metrics["market_cap_class"][row] == "Mid"
+    assert metrics["financial_health"][row] == "Excellent"
+
+
+def test_undefined_ratios_are_nan_not_inf(engine):
+    row = engine.find("LOSS")
+    # Negative EPS leaves PE undefined; zero prior revenue leaves growth undefined
+    assert math.isnan(engine.metrics["pe_ratio"][row])
+    assert math.isnan(engine.metrics["revenue_growth"][row])
+    assert engine.metrics["market_cap_class"][row] == "Small"
+    assert engine.metrics["financial_health"][row] == "Fair"
+
+
+def test_blank_row_is_unknown(engine):
+    row = engine.find("GAP")
+    assert engine.metrics["market_cap_class"][row] == "Unknown"
+    assert engine.lookup("GAP")["pe_ratio"] is None
+
+
+def test_health_labels_thresholds():
+    labels = health_labels([15, 25, 25, np.nan], [11, 6, 4, 50])
+    assert list(labels) == ["Excellent", "Good", "Fair", "Fair"]
+
+
+def test_lookup_by_ticker_or_name_returns_plain_values(engine):
+    by_ticker = engine.lookup("aapl")
+    by_name = engine.lookup("Apple")
+    assert by_ticker == by_name
+    assert by_ticker["ticker"] == "AAPL"
+    assert by_ticker["market_cap_class"] == "Large"
+    assert isinstance(by_ticker["pe_ratio"], float)
+    assert by_ticker["pe_ratio"] == round(190 / 6.5, 2)
+    assert engine.lookup("Unknown Co") is None
+
+
+def test_missing_columns_raise(tmp_path):
+    path = tmp_path / "bad.csv"
+    path.write_text("ticker,company_name,price\nA,A Co,1\n")
+    with pytest.raises(ValueError, match="missing columns"):
+        MetricsEngine(str(path))
+
+
+def test_compute_metrics_on_empty_table():
+    empty = {column: np.array([], dtype=float) for column in
+             ["price", "eps", "revenue", "revenue_prior", "net_income", "shares_outstanding"]}
+    assert all(len(values) == 0 for values in compute_metrics(empty).values())
+
+
+def test_get_metrics_engine_follows_env(tmp_path, monkeypatch):
+    monkeypatch.setenv("FUNDAMENTALS_PATH", str(tmp_path / "absent.csv"))
+    assert get_metrics_engine() is None
+
+    path = tmp_path / "fundamentals.csv"
+    path.write_text(FUNDAMENTALS)
+    monkeypatch.setenv("FUNDAMENTALS_PATH", str(path))
+    engine = get_metrics_engine()
+    assert len(engine) == 4
+    assert get_metrics_engine() is engine
@@ -0,0 +1,53 @@
+from fingerprints import FingerprintStore, fingerprint, fingerprints_from_env
+
+
+def test_fingerprint_ignores_key_order_and_volatile_fields():
+    first = fingerprint(task="t", inputs=[{"pe_ratio": 28.4, "parsed_at": "2024-01-01"}], params={"a": 1, "b": 2})
+    second = fingerprint(params={"b": 2, "a": 1}, inputs=[{"parsed_at": "2025-06-30", "pe_ratio": 28.4}], task="t")
+    assert first == second
+
+
+def test_fingerprint_changes_with_any_input():
+    base = dict(task="t", inputs=["upstream"], model="m", params={"temperature": 0.7})
+    key = fingerprint(**base)
+    assert key != fingerprint(**{**base, "task": "t2"})
+    assert key != fingerprint(**{**base, "inputs": ["changed upstream"]})
+    assert key != fingerprint(**{**base, "model": "m2"})
+    assert key != fingerprint(**{**base, "params": {"temperature": 0.2}})
+
+
+def test_lookup_reuses_only_a_matching_fingerprint(tmp_path):
+    store = FingerprintStore(str(tmp_path / "fp.db"))
+    assert store.lookup("adk", "Tesla", "research", "f1") is None
+
+    store.record("adk", "Tesla", "research", "f1", {"summary": "ok"}, seconds=2.5)
+    cached = store.lookup("adk", "Tesla", "research", "f1")
+    assert cached["output"] == {"summary": "ok"}
+    assert cached["seconds"] == 2.5
+
+    # A new fingerprint invalidates the stored output
+    assert store.lookup("adk", "Tesla", "research", "f2") is None
+    assert store.stats() == {"stages_reused": 1, "stages_recomputed": 2, "llm_seconds_saved": 2.5}
+
+
+def test_record_replaces_the_previous_output(tmp_path):
+    store = FingerprintStore(str(tmp_path / "fp.db"))
+    store.record("adk", "Tesla", "research", "f1", "old", seconds=1)
+    store.record("adk", "Tesla", "research", "f2", "new", seconds=1)
+    assert store.lookup("adk", "Tesla", "research", "f1") is None
+    assert store.lookup("adk", "Tesla", "research", "f2")["output"] == "new"
+
+
+def test_outputs_are_scoped_by_framework_and_company(tmp_path):
+    store = FingerprintStore(str(tmp_path / "fp.db"))
+    store.record("adk", "Tesla", "research", "f1", "adk output", seconds=1)
+    assert store.lookup("crewai", "Tesla", "research", "f1") is None
+    assert store.lookup("adk", "Apple", "research", "f1") is None
+    assert FingerprintStore(str(tmp_path / "fp.db")).lookup("adk", "Tesla", "research", "f1") is not None
+
+
+def test_fingerprints_from_env(tmp_path, monkeypatch):
+    monkeypatch.delenv("FINGERPRINTS_PATH", raising=False)
+    assert fingerprints_from_env() is None
+    monkeypatch.setenv("FINGERPRINTS_PATH", str(tmp_path / "env.db"))
+    assert fingerprints_from_env().path == str(tmp_path / "env.db")
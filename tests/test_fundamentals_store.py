@@ -0,0 +1,67 @@
+import json
+
+import numpy as np
+import pytest
+
+import fundamentals_store
+from fundamentals_store import INDEX_FILE, VALUES_FILE, FundamentalsStore, build_store, get_fundamentals_store
+
+FUNDAMENTALS = """ticker,company_name,price,eps,revenue,revenue_prior,net_income,shares_outstanding
+AAA,Alpha Corp,284,10,108.1e9,100e9,27.35e9,1e9
+BBB,Beta Corp,50,2,20e9,25e9,1e9,5e8
+"""
+
+
+def build(tmp_path, text=FUNDAMENTALS):
+    source = tmp_path / "fundamentals.csv"
+    source.write_text(text)
+    build_store(str(source), str(tmp_path / "store"))
+    return str(tmp_path / "store")
+
+
+@pytest.fixture
+def shared_store(monkeypatch):
+    # The shared store is cached per process; start each test without it
+    monkeypatch.setattr(fundamentals_store, "_store", None)
+
+
+def test_round_trip_by_ticker_and_name(tmp_path):
+    store = FundamentalsStore(build(tmp_path))
+    assert len(store) == 2
+
+    metrics = store.get_metrics("aaa")
+    assert (metrics["ticker"], metrics["company_name"]) == ("AAA", "Alpha Corp")
+    assert metrics["pe_ratio"] == pytest.approx(28.4)
+    assert metrics["revenue_growth"] == pytest.approx(8.1)
+    assert metrics["profit_margin"] == pytest.approx(25.3, abs=0.01)
+    assert metrics["market_cap_class"] == "Large"
+    assert store.get_metric("Beta Corp", "revenue_growth") == pytest.approx(-20.0)
+
+
+def test_lookup_misses(tmp_path, shared_store, monkeypatch):
+    store = FundamentalsStore(build(tmp_path))
+    assert store.get_metrics("Nobody Inc") is None
+    assert store.get_metric("Nobody Inc", "pe_ratio") is None
+    with pytest.raises(KeyError):
+        store.get_metric("AAA", "dividend_yield")
+
+    monkeypatch.setenv("FUNDAMENTALS_STORE", str(tmp_path / "missing"))
+    assert get_fundamentals_store() is None
+    assert fundamentals_store.lookup_fundamentals("AAA") is None
+
+
+def test_shared_store_reopens_after_a_rebuild(tmp_path, shared_store, monkeypatch):
+    monkeypatch.setenv("FUNDAMENTALS_STORE", build(tmp_path))
+    assert get_fundamentals_store().get_metric("AAA", "price") == 284.0
+
+    build(tmp_path, FUNDAMENTALS.replace("AAA,Alpha Corp,284", "AAA,Alpha Corp,300"))
+    assert get_fundamentals_store().get_metric("AAA", "price") == 300.0
+
+
+def test_index_that_does_not_match_the_values_is_rejected(tmp_path):
+    path = build(tmp_path)
+    with open(f"{path}/{INDEX_FILE}", encoding="utf-8") as f:
+        index = json.load(f)
+    np.save(f"{path}/{VALUES_FILE}", np.zeros((1, len(index["columns"]))))
+    with pytest.raises(ValueError, match="rebuild"):
+        FundamentalsStore(path)
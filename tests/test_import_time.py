@@ -0,0 +1,8 @@
+import pytest
+
+from bench_import_time import REPO_ROOT, check_deferred
+
+
+@pytest.mark.parametrize("module", ["fintech_adk", "fintech_crewai"])
+def test_importing_an_agent_module_defers_heavy_work(module, tmp_path):
+    assert check_deferred(REPO_ROOT, module, str(tmp_path)) == {"modules": [], "files": []}
@@ -0,0 +1,97 @@
+import pytest
+
+import llm_cache
+from llm_cache import LLMResponseCache, cache_from_env
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache.time, "time", clock)
+    return clock
+
+
+def make_cache(tmp_path, **kwargs):
+    return LLMResponseCache(path=str(tmp_path / "cache.db"), **kwargs)
+
+
+def test_make_key_covers_every_request_field():
+    key = LLMResponseCache.make_key("m", 0.7, "prompt", max_tokens=10)
+    assert key == LLMResponseCache.make_key("m", 0.7, "prompt", max_tokens=10)
+    assert key != LLMResponseCache.make_key("m", 0.2, "prompt", max_tokens=10)
+    assert key != LLMResponseCache.make_key("other", 0.7, "prompt", max_tokens=10)
+    assert key != LLMResponseCache.make_key("m", 0.7, "prompt", max_tokens=20)
+    assert key != LLMResponseCache.make_key("m", 0.7, ["prompt"], max_tokens=10)
+
+
+def test_hit_and_miss_counters(tmp_path, clock):
+    cache = make_cache(tmp_path)
+    assert cache.get("k") is None
+    cache.set("k", "value")
+    assert cache.get("k") == "value"
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5, "evictions": 0, "entries": 1}
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = make_cache(tmp_path, ttl_seconds=60)
+    cache.set("k", "value")
+    clock.now += 59
+    assert cache.get("k") == "value"
+    clock.now += 2
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_zero_ttl_never_expires(tmp_path, clock):
+    cache = make_cache(tmp_path, ttl_seconds=0)
+    cache.set("k", "value")
+    clock.now += 10 ** 9
+    assert cache.get("k") == "value"
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = make_cache(tmp_path, max_entries=2)
+    cache.set("a", "1")
+    clock.now += 1
+    cache.set("b", "2")
+    clock.now += 1
+    # Reading "a" makes "b" the least recently used
+    assert cache.get("a") == "1"
+    clock.now += 1
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_survive_reopening(tmp_path, clock):
+    make_cache(tmp_path).set("k", "value")
+    assert make_cache(tmp_path).get("k") == "value"
+
+
+def test_cache_from_env(tmp_path, monkeypatch):
+    monkeypatch.delenv("LLM_CACHE_PATH", raising=False)
+    assert cache_from_env() is None
+    monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "env.db"))
+    monkeypatch.setenv("LLM_CACHE_TTL", "5")
+    monkeypatch.setenv("LLM_CACHE_MAX_ENTRIES", "3")
+    cache = cache_from_env()
+    assert (cache.ttl_seconds, cache.max_entries) == (5.0, 3)
+
+
+def test_langchain_cache_skips_deadline_cuts(tmp_path):
+    from langchain_core.outputs import Generation
+    cache = llm_cache.LangChainLLMCache(make_cache(tmp_path))
+    cache.update("prompt", "llm", [Generation(text="partial", generation_info={"finish_reason": "deadline"})])
+    assert cache.lookup("prompt", "llm") is None
+    cache.update("prompt", "llm", [Generation(text="done", generation_info={"finish_reason": "stop"})])
+    assert cache.lookup("prompt", "llm")[0].text == "done"
@@ -0,0 +1,151 @@
+import asyncio
+import time
+import threading
+
+import pytest
+
+import llm_client
+from fake_llm_server import FakeLLMServer
+
+
+def serve(monkeypatch, **kwargs):
+    server = FakeLLMServer(**kwargs).start()
+    monkeypatch.setenv("OLLAMA_BASE_URL", server.base_url)
+    monkeypatch.setenv("LLM_COALESCE", "1")
+    monkeypatch.setattr(llm_client, "_shared_client", None)
+    return server
+
+
+@pytest.fixture
+def slow_server(monkeypatch):
+    # Nothing arrives before the deadline, as with a long prompt evaluation or a stalled server
+    server = serve(monkeypatch, latency=3.0)
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = serve(monkeypatch, latency=0.3)
+    yield server
+    server.stop()
+
+
+def test_deadline_counts_from_sending_the_request(slow_server):
+    llm = llm_client.PooledChatOpenAI(model="gemma3:1b", api_key="ollama", deadline=0.3)
+    started = time.monotonic()
+    result = llm.invoke("Hello")
+    assert time.monotonic() - started < 1.5
+    assert result.content == ""
+    assert result.response_metadata["finish_reason"] == "deadline"
+    assert llm_client.thread_finish_reason(clear=False) == "deadline"
+    assert llm_client.thread_finish_reason() == "deadline"
+    assert llm_client.thread_finish_reason() is None
+
+
+def test_async_deadline_counts_from_sending_the_request(slow_server):
+    llm = llm_client.PooledChatOpenAI(model="gemma3:1b", api_key="ollama", deadline=0.3)
+
+    async def ainvoke():
+        try:
+            return await llm.ainvoke("Hello")
+        finally:
+            await llm_client.aclose_loop_pool()
+
+    started = time.monotonic()
+    result = asyncio.run(ainvoke())
+    assert time.monotonic() - started < 1.5
+    assert result.response_metadata["finish_reason"] == "deadline"
+
+
+def test_identical_calls_with_a_deadline_share_one_stream(server):
+    llm = llm_client.PooledChatOpenAI(model="gemma3:1b", api_key="ollama", deadline=60)
+
+    async def ainvoke_all():
+        try:
+            return await asyncio.gather(*(llm.ainvoke("Hello") for _ in range(4)))
+        finally:
+            await llm_client.aclose_loop_pool()
+
+    results = asyncio.run(ainvoke_all())
+    assert len(server.records) == 1
+    assert len({result.content for result in results}) == 1
+    coalesced = llm_client.get_shared_client().stats()["coalesced"]
+    assert (coalesced["leaders"], coalesced["deduplicated"]) == (1, 3)
+
+
+def test_deadline_frees_the_concurrency_slot(monkeypatch):
+    # One slot and a server that stalls between tokens: the second call must not wait on the first
+    monkeypatch.setenv("LLM_MAX_CONCURRENCY", "1")
+    server = serve(monkeypatch, latency=0.1, tokens_per_second=0.5)
+    try:
+        llm = llm_client.PooledChatOpenAI(model="gemma3:1b", api_key="ollama", deadline=0.5)
+        started = time.monotonic()
+        for _ in range(2):
+            assert llm.invoke("Hello").response_metadata["finish_reason"] == "deadline"
+        assert time.monotonic() - started < 2.0
+        assert llm_client.get_shared_client().stats()["models"]["gemma3:1b"]["active"] == 0
+    finally:
+        server.stop()
+
+
+def wait_until(condition, timeout=5.0):
+    ends = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < ends
+        time.sleep(0.01)
+
+
+def test_single_flight_runs_concurrent_identical_calls_once():
+    flight = llm_client.SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def generate():
+        calls.append(1)
+        release.wait()
+        return {"content": "shared"}
+
+    results = [None] * 5
+
+    def call(n):
+        results[n] = flight.do("key", generate)
+
+    threads = [threading.Thread(target=call, args=(n,)) for n in range(5)]
+    threads[0].start()
+    wait_until(lambda: flight.leaders == 1)
+    for thread in threads[1:]:
+        thread.start()
+    wait_until(lambda: flight.deduplicated == 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert all(result == {"content": "shared"} for result in results)
+    # Followers get copies, so one caller cannot change another's result
+    assert len({id(result) for result in results}) == 5
+    # Nothing stays in flight: the next call runs again
+    assert flight.do("key", lambda: "fresh") == "fresh"
+
+
+def test_single_flight_follower_takes_over_from_a_cancelled_leader():
+    flight = llm_client.SingleFlight()
+    calls = []
+
+    async def generate():
+        calls.append(1)
+        await asyncio.sleep(0.2)
+        return "answer"
+
+    async def main():
+        leader = asyncio.create_task(flight.ado("key", generate))
+        await asyncio.sleep(0.05)
+        follower = asyncio.create_task(flight.ado("key", generate))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(main()) == "answer"
+    assert len(calls) == 2
+    assert (flight.leaders, flight.deduplicated) == (2, 1)
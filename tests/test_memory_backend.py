@@ -0,0 +1,42 @@
+import sqlite3
+
+from fintech_adk import MemoryStore, SQLiteBackend
+
+
+def test_runs_sharing_a_database_keep_their_own_keys(tmp_path):
+    path = str(tmp_path / "memory.db")
+    backend = SQLiteBackend(path)
+    alpha = MemoryStore(backend=backend, run_id="run-alpha")
+    beta = MemoryStore(backend=backend, run_id="run-beta")
+    for store, company in ((alpha, "Alpha Corp"), (beta, "Beta Corp")):
+        store.store("company_name", company)
+        store.store("research", f"{company} research", stage="company_research")
+    backend.flush()
+
+    reopened = SQLiteBackend(path)
+    assert MemoryStore(backend=reopened, run_id="run-alpha").get_all_context() == {
+        "company_name": "Alpha Corp", "research": "Alpha Corp research"}
+    assert MemoryStore(backend=reopened, run_id="run-beta").retrieve("research") == "Beta Corp research"
+    assert MemoryStore(backend=reopened, run_id="run-other").get_all_context() == {}
+
+    found = reopened.find(company="Alpha Corp", stage="company_research")
+    assert [(row["run_id"], row["value"]) for row in found] == [("run-alpha", "Alpha Corp research")]
+
+
+def test_writes_are_batched_but_readable_before_the_flush(tmp_path):
+    path = str(tmp_path / "memory.db")
+    backend = SQLiteBackend(path, batch_size=3)
+    store = MemoryStore(backend=backend, run_id="run")
+
+    def written() -> int:
+        with sqlite3.connect(path) as conn:
+            return conn.execute("SELECT COUNT(*) FROM memory").fetchone()[0]
+
+    store.store("company_name", "Alpha Corp")
+    store.store("research", {"summary": "text"})
+    assert written() == 0
+    assert store.retrieve("research") == {"summary": "text"}
+    assert backend.size() == 2
+
+    store.store("market_info", "markets")
+    assert written() == 3
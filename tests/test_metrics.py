@@ -0,0 +1,42 @@
+import pickle
+
+from metrics import NOOP_METRIC, Registry
+
+
+def test_disabled_registry_hands_out_noop_metrics():
+    registry = Registry(enabled=False)
+    assert registry.counter("c", "doc") is NOOP_METRIC
+    assert registry.drain() == {}
+
+
+def test_render_counter_and_histogram():
+    registry = Registry(enabled=True)
+    registry.counter("requests", "Requests", ["model"]).labels("m").inc(2)
+    registry.histogram("latency", "Latency", buckets=(0.1, 1.0)).observe(0.5)
+    text = registry.render()
+    assert 'requests_total{model="m"} 2.0' in text
+    assert 'latency_bucket{le="0.1"} 0' in text
+    assert 'latency_bucket{le="1.0"} 1' in text
+    assert 'latency_bucket{le="+Inf"} 1' in text
+
+
+def test_drained_worker_values_merge_into_the_parent():
+    parent, worker = Registry(enabled=True), Registry(enabled=True)
+    for registry in (parent, worker):
+        registry.counter("requests", "Requests", ["model"])
+        registry.histogram("latency", "Latency", ["model"], buckets=(0.1, 1.0))
+    parent.counter("requests", "Requests", ["model"]).labels("m").inc()
+
+    worker.counter("requests", "Requests", ["model"]).labels("m").inc(3)
+    worker.histogram("latency", "Latency", ["model"], buckets=(0.1, 1.0)).labels("m").observe(0.05)
+    drained = pickle.loads(pickle.dumps(worker.drain()))
+    parent.merge(drained)
+
+    text = parent.render()
+    assert 'requests_total{model="m"} 4.0' in text
+    assert 'latency_count{model="m"} 1' in text
+    assert 'latency_bucket{model="m",le="0.1"} 1' in text
+
+    # Draining resets the worker, so the next result carries only new work
+    assert worker.drain() == {"requests": {("m",): 0.0},
+                              "latency": {("m",): ([0, 0], 0.0, 0)}}
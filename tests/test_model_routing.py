@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+import model_routing
+from model_routing import (DEFAULT_MODEL, DEFAULT_ROUTES, LARGE_MODEL, Route, load_routes, reference_tokens,
+                           route_for, summarize_limits, summarize_routing)
+
+
+def test_escalated_route_falls_back_to_the_original_model():
+    route = DEFAULT_ROUTES["Quality Validator"]
+    escalated = route.escalated()
+    assert (escalated.model, escalated.fallback, escalated.escalate_to) == (LARGE_MODEL, route.model, None)
+    assert escalated.max_tokens == route.max_tokens
+
+
+def test_limits_and_uncapped():
+    route = Route(max_tokens=100, deadline=5)
+    assert route.limits() == {"max_tokens": 100, "stop": list(model_routing.PROMPT_ECHO_STOPS), "deadline": 5}
+    assert route.uncapped().limits() is None
+
+
+def test_load_routes_without_a_file_returns_the_defaults():
+    assert load_routes(None) == DEFAULT_ROUTES
+
+
+def test_load_routes_overrides_only_the_given_fields(tmp_path):
+    path = tmp_path / "routes.json"
+    path.write_text(json.dumps({
+        "Report Compiler": {"model": "gemma3:12b", "max_tokens": 3000},
+        "Market Analyst": {"stop": ["END"], "fallback": None},
+        "New Role": {"temperature": 0.3},
+    }))
+    routes = load_routes(str(path))
+
+    compiler = routes["Report Compiler"]
+    assert (compiler.model, compiler.max_tokens) == ("gemma3:12b", 3000)
+    assert compiler.temperature == DEFAULT_ROUTES["Report Compiler"].temperature
+    # Moved off the default model, so it falls back to it
+    assert compiler.fallback == DEFAULT_MODEL
+
+    assert routes["Market Analyst"].stop == ("END",)
+    assert routes["New Role"] == Route(temperature=0.3)
+    assert routes["Risk Assessor"] == DEFAULT_ROUTES["Risk Assessor"]
+
+
+def test_route_for_unknown_role_and_disabled_limits(monkeypatch):
+    assert route_for("Nobody") == Route()
+    monkeypatch.setattr(model_routing, "GENERATION_LIMITS", False)
+    assert route_for("Report Compiler").limits() is None
+
+
+def test_summarize_routing_costs_against_the_default_model():
+    summary = summarize_routing([
+        {"role": "Quality Validator", "model": DEFAULT_MODEL, "reason": "route", "seconds": 1.0, "tokens": 1000},
+        {"role": "Quality Validator", "model": LARGE_MODEL, "reason": "escalated", "seconds": 3.0, "tokens": 500},
+    ])
+    assert summary["models"][LARGE_MODEL] == {"calls": 1, "seconds": 3.0, "tokens": 500, "cost_units": 2.0}
+    assert summary["escalations"] == ["Quality Validator"]
+    assert summary["escalation_seconds"] == 3.0
+    assert summary["cost_units"] == pytest.approx(3.0)
+    assert summary["baseline_cost_units"] == pytest.approx(1.5)
+    assert summary["extra_cost_units"] == pytest.approx(1.5)
+
+
+def test_reference_tokens_uses_only_uncapped_successful_runs():
+    records = [
+        {"agent": "Report Compiler", "limits": None, "errors": [], "output_tokens": 900},
+        {"agent": "Report Compiler", "limits": None, "errors": [], "output_tokens": 1100},
+        {"agent": "Report Compiler", "limits": None, "errors": [], "output_tokens": 1300},
+        {"agent": "Report Compiler", "limits": {"max_tokens": 100}, "errors": [], "output_tokens": 100},
+        {"agent": "Report Compiler", "limits": None, "errors": ["timeout"], "output_tokens": 5},
+        {"agent": "Risk Assessor", "limits": None, "errors": [], "output_tokens": 0},
+    ]
+    assert reference_tokens(records) == {"Report Compiler": 1100}
+
+
+def test_summarize_limits_savings_and_repeated_stages():
+    calls = [
+        {"stage": "report", "role": "Report Compiler", "finish_reason": "length", "tokens": 400, "seconds": 20.0},
+        {"stage": "report", "role": "Report Compiler", "finish_reason": "stop", "tokens": 1000, "seconds": 50.0},
+        {"stage": "risk", "role": "Risk Assessor", "finish_reason": "deadline", "tokens": 10, "seconds": 0.0},
+    ]
+    summary = summarize_limits(calls, {"Report Compiler": 1100})
+
+    assert list(summary["stages"]) == ["report", "report #2", "risk"]
+    first = summary["stages"]["report"]
+    assert first["capped"] and first["tokens_saved"] == 700
+    assert first["seconds_saved"] == pytest.approx(35.0)
+    assert summary["stages"]["risk"]["tokens_saved"] is None
+    assert summary["capped_stages"] == ["report", "risk"]
+    assert summary["tokens_saved"] == 800
+    assert summary["seconds_saved"] == pytest.approx(35.0 + 5.0)
@@ -0,0 +1,129 @@
+import json
+
+import pytest
+
+from report_validation import (REQUIRED_SECTIONS, parse_report, reports_problem, review_verdict, validate_report,
+                               validate_sections, validation_stats)
+
+REFERENCE = {"pe_ratio": 28.4, "revenue_growth": 8.1, "profit_margin": 25.3, "market_cap_class": "Large"}
+
+
+def report(**overrides):
+    sections = {name: f"{name} text" for name in REQUIRED_SECTIONS}
+    sections["financial_analysis"] = "PE ratio of 28.4, revenue growth 8.1% and a net profit margin of 25.3%."
+    sections["recommendation"] = "Hold"
+    sections.update(overrides)
+    return sections
+
+
+def test_parse_report_accepts_dict_json_and_markdown():
+    assert parse_report({"Summary": "a"}) == ("json", {"executive_summary": "a"})
+    assert parse_report('Here it is: {"risk_analysis": "b"} done') == ("json", {"risk_assessment": "b"})
+    fmt, sections = parse_report("# Company Overview\nBig.\n## Investment Recommendation ##\nBuy\n")
+    assert fmt == "markdown"
+    assert sections == {"company_overview": "Big.\n", "recommendation": "Buy\n"}
+
+
+def test_matching_report_passes():
+    result = validate_report(json.dumps(report()), REFERENCE)
+    assert result.status == "pass"
+    assert result.recommendation == "Hold"
+    assert sorted(result.checked_metrics) == ["pe_ratio", "profit_margin", "revenue_growth"]
+
+
+def test_figures_within_tolerance_pass():
+    # 5% relative, with a 0.5 absolute floor for small percentages
+    body = "P/E ratio: 29.5. Revenue growth rate 8.5%. Profit margin 24.1%."
+    assert validate_report(report(financial_analysis=body), REFERENCE).status == "pass"
+
+
+def test_mismatched_figure_fails():
+    result = validate_report(report(financial_analysis="Price-to-earnings 45.0, revenue growth 8.1%"), REFERENCE)
+    assert result.status == "fail"
+    assert result.mismatched_metrics == {"pe_ratio": {"expected": 28.4, "reported": 45.0}}
+
+
+def test_thousands_separators_and_negative_numbers():
+    reference = {"pe_ratio": 1250.0, "revenue_growth": -12.0}
+    body = "PE ratio 1,250 and revenue growth of -12%"
+    result = validate_report(report(financial_analysis=body), reference)
+    assert result.status == "pass"
+    assert sorted(result.checked_metrics) == ["pe_ratio", "revenue_growth"]
+
+
+def test_missing_sections_and_bad_recommendation_fail():
+    sections = report(recommendation="Accumulate")
+    del sections["risk_assessment"]
+    result = validate_report(sections, REFERENCE)
+    assert result.status == "fail"
+    assert result.missing_sections == ["risk_assessment"]
+    assert "Recommendation is not one of Buy/Hold/Sell" in result.issues
+
+
+def test_ambiguous_recommendation_is_inconclusive():
+    result = validate_report(report(recommendation="Buy on dips, otherwise Hold"), REFERENCE)
+    assert result.status == "inconclusive"
+
+
+def test_no_reference_is_inconclusive():
+    assert validate_report(report(), {}).status == "inconclusive"
+
+
+def test_markdown_report_is_checked():
+    text = "\n".join(f"## {name.replace('_', ' ').title()}\n{body}" for name, body in report().items())
+    result = validate_report(text, REFERENCE)
+    assert result.format == "markdown"
+    assert result.status == "pass"
+
+
+def test_validate_sections_checks_only_what_is_written():
+    assert validate_sections({"recommendation": "Sell"}, REFERENCE).status == "pass"
+    assert validate_sections({"market_analysis": " "}, REFERENCE).status == "fail"
+    result = validate_sections({"financial_analysis": "Profit margin 40%"}, REFERENCE)
+    assert result.mismatched_metrics["profit_margin"]["reported"] == 40.0
+
+
+def test_whole_report_checks_are_counted():
+    before = validation_stats()
+    validate_report(report(), REFERENCE)
+    validate_sections({"recommendation": "Sell"}, REFERENCE)
+    after = validation_stats()
+    assert after["rule_validations"] == before["rule_validations"] + 1
+    assert after["llm_validations_skipped"] == before["llm_validations_skipped"] + 1
+
+
+def test_report_quoting_no_computed_figure_is_inconclusive():
+    result = validate_report(report(financial_analysis="Solid numbers all round."), REFERENCE)
+    assert result.status == "inconclusive"
+    assert result.checked_metrics == []
+    assert "Report quotes none of the computed metrics" in result.issues
+
+
+def test_last_verdict_line_decides_review():
+    assert review_verdict("Figures look inconsistent at first.\nVERDICT: FAIL") == "fail"
+    assert review_verdict("Earlier draft had an incorrect margin.\n**Verdict - PASS**") == "pass"
+    assert review_verdict("VERDICT: PASS\n...on reflection\nVERDICT: FAIL") == "fail"
+
+
+def test_problem_words_without_a_verdict_are_inconclusive():
+    assert review_verdict("There are no incorrect values in this report.") == "inconclusive"
+    # A verdict mentioned mid-sentence is not the verdict line
+    assert review_verdict("I cannot give a verdict: pass or fail depends on the data") == "inconclusive"
+
+
+def test_only_a_passing_verdict_skips_escalation():
+    assert not reports_problem("All good.\nVERDICT: PASS")
+    assert reports_problem("VERDICT: FAIL")
+    assert reports_problem("All good.")
+
+
+@pytest.mark.parametrize("body", [
+    "Apple is expected to grow 8 percent next year.",
+    "The group operates 500 stores and keeps its pipeline 3 deep.",
+    "P/E ratio in 2024 was steady.",
+    "The P/E expanded 12% over the year.",
+])
+def test_pe_ratio_is_not_read_from_other_words_years_or_percentages(body):
+    result = validate_sections({"financial_analysis": body}, REFERENCE)
+    assert "pe_ratio" not in result.checked_metrics
+    assert result.status == "pass"
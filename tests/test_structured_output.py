@@ -0,0 +1,76 @@
+import json
+
+from structured_output import IncrementalJSONParser, InvestmentReport, ReportSummary, schema_instructions, validate_fields
+
+REPORT = {
+    "executive_summary": "Stable, \"steady\" growth.",
+    "company_overview": "Makes {widgets} and [gadgets].",
+    "market_analysis": "Leader.",
+    "financial_analysis": "PE 28.4",
+    "risk_assessment": "Supply chain.",
+    "recommendation": "Hold",
+}
+
+
+def feed_in_chunks(parser, text, size):
+    completed = []
+    for start in range(0, len(text), size):
+        completed.extend(parser.feed(text[start:start + size]))
+    return completed
+
+
+def test_fields_are_emitted_once_in_order_for_any_chunking():
+    text = "```json\n" + json.dumps(REPORT, indent=2) + "\n```"
+    for size in (1, 3, 17, len(text)):
+        parser = IncrementalJSONParser()
+        completed = feed_in_chunks(parser, text, size)
+        assert completed == list(REPORT.items())
+        assert parser.done
+        assert parser.fields == REPORT
+
+
+def test_field_is_emitted_as_soon_as_it_closes():
+    parser = IncrementalJSONParser()
+    assert parser.feed('{"recommendation": "Ho') == []
+    assert parser.feed('ld", "risk') == [("recommendation", "Hold")]
+
+
+def test_nested_and_scalar_values():
+    parser = IncrementalJSONParser()
+    text = '{"a": {"b": [1, {"c": "}"}]}, "n": 12.5, "flag": true, "none": null}'
+    completed = feed_in_chunks(parser, text, 4)
+    assert completed == [("a", {"b": [1, {"c": "}"}]}), ("n", 12.5), ("flag", True), ("none", None)]
+    assert parser.done
+
+
+def test_escaped_quotes_and_text_after_the_object():
+    parser = IncrementalJSONParser()
+    completed = parser.feed('{"q": "say \\"hi\\" \\\\"} trailing {"ignored": 1}')
+    assert completed == [("q", 'say "hi" \\')]
+    assert parser.fields == {"q": 'say "hi" \\'}
+
+
+def test_unparseable_field_is_skipped():
+    parser = IncrementalJSONParser()
+    completed = parser.feed('{"bad": tru, "good": "yes"}')
+    assert completed == [("good", "yes")]
+
+
+def test_validate_fields_keeps_valid_and_lists_missing():
+    valid, missing = validate_fields(InvestmentReport, {**REPORT, "market_analysis": "  ", "recommendation": None})
+    assert missing == ["market_analysis", "recommendation"]
+    assert "market_analysis" not in valid
+    assert valid["executive_summary"] == REPORT["executive_summary"]
+
+
+def test_validate_fields_serializes_structured_values():
+    valid, missing = validate_fields(ReportSummary, {"executive_summary": {"points": ["a"]},
+                                                     "recommendation": " Buy "})
+    assert missing == []
+    assert valid == {"executive_summary": '{"points": ["a"]}', "recommendation": "Buy"}
+
+
+def test_schema_instructions_list_requested_fields():
+    text = schema_instructions(InvestmentReport, ["recommendation"])
+    assert '"recommendation"' in text
+    assert '"executive_summary"' not in text
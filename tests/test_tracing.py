@@ -0,0 +1,66 @@
+import os
+import asyncio
+
+import pytest
+
+from tracing import JSONFileExporter, Tracer, read_spans, summarize
+
+
+@pytest.fixture
+def traced(tmp_path):
+    path = str(tmp_path / "traces.jsonl")
+    return Tracer(JSONFileExporter(path)), path
+
+
+def test_nested_spans_are_exported_when_the_root_ends(traced):
+    tracer, path = traced
+    with tracer.span("workflow.run", company="Tesla Inc"):
+        with tracer.span("stage research") as stage:
+            stage.set_attributes(prompt_bytes=1200, cache_hit=False, skipped=None)
+            with tracer.span("llm.http", activate=False, model="gemma3:1b"):
+                pass
+        with pytest.raises(ValueError):
+            with tracer.span("output.write"):
+                raise ValueError("disk full")
+        # Child spans are batched until their trace ends
+        assert not os.path.exists(path)
+
+    spans = {span["name"]: span for span in read_spans(path)}
+    assert set(spans) == {"workflow.run", "stage research", "llm.http", "output.write"}
+    root = spans["workflow.run"]
+    assert "parentSpanId" not in root
+    assert spans["stage research"]["parentSpanId"] == root["spanId"]
+    assert spans["llm.http"]["parentSpanId"] == spans["stage research"]["spanId"]
+    assert spans["output.write"]["parentSpanId"] == root["spanId"]
+    assert len({span["traceId"] for span in spans.values()}) == 1
+    assert spans["stage research"]["attributes"] == [
+        {"key": "prompt_bytes", "value": {"intValue": "1200"}},
+        {"key": "cache_hit", "value": {"boolValue": False}},
+    ]
+    assert spans["output.write"]["status"] == {"code": 2, "message": "ValueError: disk full"}
+
+
+def test_concurrent_tasks_are_parented_on_the_span_that_started_them(traced):
+    tracer, path = traced
+
+    async def stage(name):
+        with tracer.span(f"stage {name}"):
+            await asyncio.sleep(0.05)
+            with tracer.span("prompt.build"):
+                pass
+
+    async def run():
+        with tracer.span("workflow.run"):
+            await asyncio.gather(stage("a"), stage("b"))
+
+    asyncio.run(run())
+
+    spans = read_spans(path)
+    by_id = {span["spanId"]: span for span in spans}
+    builds = [span for span in spans if span["name"] == "prompt.build"]
+    assert sorted(by_id[span["parentSpanId"]]["name"] for span in builds) == ["stage a", "stage b"]
+    # The stages overlap, so the run's self time is not negative
+    summary = summarize(spans)
+    assert summary["workflow.run"]["count"] == 1
+    assert summary["workflow.run"]["self"] >= 0.0
+    assert summary["stage a"]["total"] >= 0.05
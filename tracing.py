@@ -0,0 +1,215 @@
+"""
+Lightweight tracing
+Nested spans (run, stage, prompt build, LLM request, serialization, file write)
+exported as OTLP/JSON lines, the format of the OpenTelemetry collector's file
+exporter. Disabled unless TRACE_PATH is set; a disabled span is a shared no-op
+
+Usage:
+    TRACE_PATH=traces.jsonl python fintech_adk.py "Tesla Inc"
+    python tracing.py traces.jsonl        # time per span name
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+import contextvars
+from typing import Any, Dict, List, Optional
+
+_current = contextvars.ContextVar("current_span", default=None)
+
+
+def _attribute_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Span:
+    """A timed operation with attributes; use as a context manager"""
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns",
+                 "attributes", "error", "_activate", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, parent: Optional["Span"], activate: bool,
+                 attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = {key: value for key, value in attributes.items() if value is not None}
+        self.error = None
+        self._activate = activate
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any):
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, **attributes):
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def __enter__(self) -> "Span":
+        if self._activate:
+            self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        if exc_type is not None and not issubclass(exc_type, GeneratorExit):
+            self.error = f"{exc_type.__name__}: {exc}"
+        if self._token is not None:
+            try:
+                _current.reset(self._token)
+            except ValueError:
+                # Ended from another context (e.g. a generator finalized elsewhere)
+                pass
+        self.tracer._finish(self)
+        return False
+
+    @property
+    def duration(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": key, "value": _attribute_value(value)} for key, value in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class _NoopSpan:
+    """Stand-in returned while tracing is off"""
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_attributes(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class JSONFileExporter:
+    """Append finished spans to a file as OTLP/JSON export requests, one per line"""
+
+    def __init__(self, path: str, service_name: str = "fintech-analysis", batch_size: int = 256):
+        self.path = path
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self._pending: List[Span] = []
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def export(self, span: Span):
+        with self._lock:
+            self._pending.append(span)
+            # A finished root span closes its trace; write the batch then
+            if span.parent_id is None or len(self._pending) >= self.batch_size:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        request = {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{"scope": {"name": "fintech.tracing"},
+                            "spans": [span.to_otlp() for span in self._pending]}],
+        }]}
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(request) + "\n")
+        self._pending = []
+
+
+class Tracer:
+    """Creates spans parented on the span active in the current context"""
+
+    def __init__(self, exporter: JSONFileExporter = None):
+        self.exporter = exporter
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def span(self, name: str, activate: bool = True, **attributes):
+        """Span context manager; activate=False records a leaf without making it current"""
+        if self.exporter is None:
+            return NOOP_SPAN
+        return Span(self, name, _current.get(), activate, attributes)
+
+    def _finish(self, span: Span):
+        self.exporter.export(span)
+
+
+def current_span():
+    """Innermost active span, or the no-op span"""
+    return _current.get() or NOOP_SPAN
+
+
+_trace_path = os.getenv("TRACE_PATH")
+tracer = Tracer(JSONFileExporter(_trace_path) if _trace_path else None)
+
+
+def read_spans(path: str) -> List[Dict[str, Any]]:
+    """All spans in an OTLP/JSON lines file"""
+    spans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            for resource in json.loads(line)["resourceSpans"]:
+                for scope in resource["scopeSpans"]:
+                    spans.extend(scope["spans"])
+    return spans
+
+
+def summarize(spans: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """Total and self time (minus child spans) per span name"""
+    durations = {span["spanId"]: (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e9
+                 for span in spans}
+    child_time: Dict[str, float] = {}
+    for span in spans:
+        if span.get("parentSpanId"):
+            child_time[span["parentSpanId"]] = child_time.get(span["parentSpanId"], 0.0) + durations[span["spanId"]]
+
+    summary: Dict[str, Dict[str, float]] = {}
+    for span in spans:
+        entry = summary.setdefault(span["name"], {"count": 0, "total": 0.0, "self": 0.0})
+        entry["count"] += 1
+        entry["total"] += durations[span["spanId"]]
+        # Children of concurrent stages overlap, so self time is floored at zero
+        entry["self"] += max(0.0, durations[span["spanId"]] - child_time.get(span["spanId"], 0.0))
+    return dict(sorted(summary.items(), key=lambda item: -item[1]["total"]))
+
+
+if __name__ == "__main__":
+    for name, entry in summarize(read_spans(sys.argv[1])).items():
+        print(f"{name:40s} {entry['count']:6d} {entry['total']:10.3f}s total {entry['self']:10.3f}s self")